@@ -0,0 +1,167 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+import ffmpeg
+import numpy as np
+
+from utils.setup_ffmpeg import get_toolkit
+
+# Analysis runs on a low-rate mono stream; that is plenty for energy envelopes.
+SAMPLE_RATE = 8000
+WINDOW_SECONDS = 0.5
+# Sub-windows (50 ms) measure how much the energy fluctuates inside a window:
+# speech is modulated at syllable rate, music and hum are much steadier.
+SUB_WINDOWS = 10
+MIN_SILENCE_SECONDS = 1.5
+SMOOTHING_SECONDS = 30
+# Windows read from the pipe per chunk (~1 minute), keeps memory bounded for any length
+CHUNK_WINDOWS = 120
+
+
+def _window_features(samples: np.ndarray) -> tuple:
+    """RMS level (dB) and energy modulation (dB std of sub-windows) per window, in one vectorized pass."""
+    window = int(SAMPLE_RATE * WINDOW_SECONDS)
+    sub = window // SUB_WINDOWS
+    count = len(samples) // window
+    frames = samples[:count * window].astype(np.float32).reshape(count, SUB_WINDOWS, sub) / 32768.0
+    sub_power = np.mean(frames * frames, axis=2) + 1e-10
+    level_db = 10 * np.log10(np.mean(sub_power, axis=1))
+    modulation_db = np.std(10 * np.log10(sub_power), axis=1)
+    return level_db, modulation_db
+
+
+def compute_energy_map(source: str, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    Decodes `source` (file path or stream URL) to mono PCM through an ffmpeg pipe and
+    returns per-window level and modulation arrays. Only one chunk of PCM is held in memory.
+    """
+    ffmpeg_executable = get_toolkit().ffmpeg
+
+    input_args = {}
+    if start:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    process = (
+        ffmpeg
+        .input(source, **input_args)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE, vn=None)
+        .global_args('-nostats', '-loglevel', 'error')
+        .run_async(cmd=ffmpeg_executable, pipe_stdout=True, pipe_stderr=True)
+    )
+
+    window_bytes = int(SAMPLE_RATE * WINDOW_SECONDS) * 2
+    chunk_bytes = window_bytes * CHUNK_WINDOWS
+    levels: List[np.ndarray] = []
+    modulations: List[np.ndarray] = []
+    pending = b""
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            pending += data
+            usable = len(pending) - len(pending) % window_bytes
+            if usable:
+                level, modulation = _window_features(np.frombuffer(pending[:usable], dtype='<i2'))
+                levels.append(level)
+                modulations.append(modulation)
+                pending = pending[usable:]
+        stderr = process.stderr.read()
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+
+    return {
+        "level_db": np.concatenate(levels) if levels else np.zeros(0),
+        "modulation_db": np.concatenate(modulations) if modulations else np.zeros(0),
+    }
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """Start/end indices (end exclusive) of consecutive True runs in `mask`."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges.reshape(-1, 2)
+
+
+def find_silences(level_db: np.ndarray) -> tuple:
+    """Returns the silence threshold (dB) and the silent runs that are long enough to count as a cut."""
+    if len(level_db) == 0:
+        return -60.0, np.zeros((0, 2), dtype=int)
+    # Threshold adapts to the recording: a bit above its noise floor, never above -30 dB
+    noise_floor = np.percentile(level_db, 10)
+    threshold = min(noise_floor + 10, -30.0)
+    runs = _runs(level_db < threshold)
+    min_windows = int(MIN_SILENCE_SECONDS / WINDOW_SECONDS)
+    return threshold, runs[(runs[:, 1] - runs[:, 0]) >= min_windows]
+
+
+def propose_boundaries(level_db: np.ndarray, modulation_db: np.ndarray, max_candidates: int = 10) -> Dict[str, Any]:
+    """
+    Proposes sermon start/end from the energy maps: the longest stretch of speech-like
+    audio (strongly modulated energy), snapped to the nearest silences. Returns the
+    proposal together with the longest silences as candidate cut points.
+    """
+    duration = len(level_db) * WINDOW_SECONDS
+    threshold, silences = find_silences(level_db)
+    result: Dict[str, Any] = {
+        "duration": duration,
+        "window": WINDOW_SECONDS,
+        "silence_threshold_db": round(float(threshold), 1),
+        "proposed": None,
+        "candidates": [],
+    }
+    if len(level_db) == 0:
+        return result
+
+    # Speech-likeness per window, smoothed over half a minute
+    audible = level_db >= threshold
+    if not audible.any():
+        return result
+    voiced = audible & (modulation_db >= np.median(modulation_db[audible]))
+    # Never wider than the input, or mode='same' returns more windows than there are
+    kernel = np.ones(min(int(SMOOTHING_SECONDS / WINDOW_SECONDS), len(voiced)))
+    speech_share = np.convolve(voiced.astype(np.float32), kernel / len(kernel), mode='same')
+    speech_runs = _runs(speech_share >= 0.5)
+
+    silence_centers = (silences.mean(axis=1) * WINDOW_SECONDS) if len(silences) else np.zeros(0)
+    silence_lengths = (silences[:, 1] - silences[:, 0]) * WINDOW_SECONDS if len(silences) else np.zeros(0)
+
+    def snap(seconds: float) -> float:
+        if len(silence_centers) == 0:
+            return seconds
+        nearest = np.argmin(np.abs(silence_centers - seconds))
+        # Only snap to silences within a minute, otherwise keep the raw estimate
+        return float(silence_centers[nearest]) if abs(silence_centers[nearest] - seconds) <= 60 else seconds
+
+    if len(speech_runs):
+        longest = speech_runs[np.argmax(speech_runs[:, 1] - speech_runs[:, 0])]
+        start, end = snap(longest[0] * WINDOW_SECONDS), snap(longest[1] * WINDOW_SECONDS)
+        result["proposed"] = {"start": round(start, 1), "end": round(end, 1)}
+
+    for i in np.argsort(-silence_lengths)[:max_candidates]:
+        result["candidates"].append({
+            "time": round(float(silence_centers[i]), 1),
+            "silence_length": round(float(silence_lengths[i]), 1),
+        })
+    result["candidates"].sort(key=lambda c: c["time"])
+    return result
+
+
+def analyze_audio(source: str, start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+    """Runs the energy/silence analysis on `source` and returns candidate cut points in seconds."""
+    maps = compute_energy_map(source, start, end)
+    result = propose_boundaries(maps["level_db"], maps["modulation_db"])
+    offset = start or 0
+    if offset:
+        if result["proposed"]:
+            result["proposed"] = {k: round(v + offset, 1) for k, v in result["proposed"].items()}
+        for candidate in result["candidates"]:
+            candidate["time"] = round(candidate["time"] + offset, 1)
+    logging.info(f"Analysis of {source}: proposed {result['proposed']}, {len(result['candidates'])} candidates")
+    return result
@@ -0,0 +1,193 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from main import load_config
+
+CONFIG = load_config()
+
+BACKEND_DIR = Path(__file__).parent.parent
+CACHE_DIR = BACKEND_DIR / "processed_files" / ".cache"
+# Downloaded source audio, so a video can be re-encoded with other settings without downloading it again
+SOURCE_DIR = CACHE_DIR / "sources"
+# Short A/B excerpts rendered from the sources while tuning the compressor
+PREVIEW_DIR = CACHE_DIR / "previews"
+PREVIEW_MAX_BYTES = 64 * 1024 * 1024
+
+# Only these settings (and the section) change the encoded audio; metadata is applied afterwards.
+# `single_pass` (legacy MP3 round-trip or not) and `parallel_encode` (segments without bit
+# reservoir) describe how the audio was produced, which changes the bytes as well.
+KEY_FIELDS = ["threshold_db", "ratio", "attack", "release", "bitrate", "loudness_target", "true_peak",
+              "single_pass", "parallel_encode"]
+
+_lock = threading.Lock()
+# Source files in use by running jobs -> number of users; eviction skips them
+_leases: Dict[str, int] = {}
+
+
+def _max_bytes() -> int:
+    return int(CONFIG.get("cache_max_mb", 2048)) * 1024 * 1024
+
+
+def _source_max_bytes() -> int:
+    return int(CONFIG.get("source_cache_max_mb", 4096)) * 1024 * 1024
+
+
+def cache_key(video_id: str, settings: Dict[str, Any],
+              start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """Content address of a processed (untagged) output of a video section."""
+    parts = [video_id] + [str(settings.get(field)) for field in KEY_FIELDS] + [str(start), str(end)]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:32]
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.mp3"
+
+
+def lookup(key: str) -> Optional[str]:
+    """Returns the cached file for `key` and marks it as recently used, or None."""
+    path = _entry_path(key)
+    with _lock:
+        if not path.exists():
+            return None
+        # The mtime doubles as the LRU timestamp
+        os.utime(path)
+    logging.info(f"Cache hit for {key}")
+    return str(path)
+
+
+def restore(key: str, target_path: str) -> bool:
+    """Copies the cached file for `key` to `target_path`. Returns False on a miss."""
+    cached = lookup(key)
+    if cached is None:
+        return False
+    shutil.copyfile(cached, target_path)
+    return True
+
+
+def store(key: str, source_path: str):
+    """Adds a processed (untagged) file to the cache and evicts old entries if needed."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(key)
+    tmp_path = path.with_suffix(".part")
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not store {source_path} in cache: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return
+    evict()
+
+
+def _evict(directory: Path, pattern: str, max_bytes: int, keep: Optional[Path] = None):
+    with _lock:
+        if not directory.exists():
+            return
+        entries = [(p, p.stat()) for p in directory.glob(pattern) if p.is_file() and p.suffix != ".part"]
+        total = sum(st.st_size for _, st in entries)
+        for path, st in sorted(entries, key=lambda e: e[1].st_mtime):
+            if total <= max_bytes:
+                break
+            if path == keep or _leases.get(str(path)):
+                continue
+            try:
+                path.unlink()
+                total -= st.st_size
+                logging.info(f"Evicted {path.name} from cache")
+            except OSError as e:
+                logging.warning(f"Could not evict {path}: {e}")
+
+
+def evict(max_bytes: Optional[int] = None):
+    """Deletes least recently used entries until the cache fits into `max_bytes`."""
+    _evict(CACHE_DIR, "*.mp3", _max_bytes() if max_bytes is None else max_bytes)
+
+
+# --- Source audio ---
+
+def source_key(video_id: str, start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """Content address of the downloaded audio of a video section (the whole video without one)."""
+    return hashlib.sha256(json.dumps([video_id, str(start), str(end)]).encode()).hexdigest()[:32]
+
+
+def _source_entry(key: str) -> Optional[Path]:
+    # Native streams keep their container, so the extension is not known up front
+    for path in SOURCE_DIR.glob(f"{key}.*"):
+        if path.suffix != ".part":
+            return path
+    return None
+
+
+def _lease(path: str):
+    _leases[path] = _leases.get(path, 0) + 1
+
+
+def lease_source(path: str):
+    """Protects a source file from eviction until `release_source` is called for it."""
+    with _lock:
+        _lease(str(path))
+
+
+def release_source(path: str):
+    with _lock:
+        count = _leases.get(str(path), 0) - 1
+        if count > 0:
+            _leases[str(path)] = count
+        else:
+            _leases.pop(str(path), None)
+
+
+def lookup_source(video_id: str, start: Optional[float] = None,
+                  end: Optional[float] = None, lease: bool = False) -> Optional[Tuple[str, bool]]:
+    """
+    Finds downloaded audio for a video section and marks it as recently used.
+    Returns the path and whether it already is exactly that section (False means the
+    whole video was found and still has to be trimmed), or None. With `lease` the file
+    is also leased (see `lease_source`) before anything can evict it.
+    """
+    candidates = [(source_key(video_id, start, end), True)]
+    if start is not None or end is not None:
+        candidates.append((source_key(video_id), False))
+    with _lock:
+        for key, exact in candidates:
+            path = _source_entry(key)
+            if path is not None:
+                os.utime(path)
+                if lease:
+                    _lease(str(path))
+                logging.info(f"Source cache hit for {video_id} ({path.name})")
+                return str(path), exact
+    return None
+
+
+def store_source(video_id: str, start: Optional[float], end: Optional[float], source_path: str,
+                 lease: bool = False) -> str:
+    """
+    Moves a downloaded file into the source cache and returns its new location.
+    The file stays where it is if it cannot be moved. With `lease` the returned
+    file is leased (see `lease_source`).
+    """
+    SOURCE_DIR.mkdir(parents=True, exist_ok=True)
+    path = SOURCE_DIR / f"{source_key(video_id, start, end)}{Path(source_path).suffix}"
+    try:
+        shutil.move(source_path, path)
+    except OSError as e:
+        logging.warning(f"Could not store {source_path} in source cache: {e}")
+        if lease:
+            lease_source(source_path)
+        return source_path
+    if lease:
+        lease_source(str(path))
+    _evict(SOURCE_DIR, "*", _source_max_bytes(), keep=path)
+    return str(path)
+
+
+def evict_previews():
+    """Keeps the rendered previews within a small fixed budget."""
+    _evict(PREVIEW_DIR, "*.mp3", PREVIEW_MAX_BYTES)
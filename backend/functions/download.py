@@ -1,87 +1,259 @@
+import io
 import os
+import math
 import json
+import hashlib
+import threading
+import time
 import logging
 from pathlib import Path
-from typing import Generator, Dict, Any
+from typing import Generator, Dict, Any, List, Optional, Tuple
 
 from main import load_config
-from utils.setup_ffmpeg import get_ffmpeg_path
+from utils.setup_ffmpeg import get_toolkit
 import googleapiclient.discovery
+import googleapiclient.errors
 import isodate
 import yt_dlp
 import ffmpeg
 from mutagen.mp3 import MP3
-from mutagen.id3 import TIT2, TPE1, TALB, TPE2, COMM, TDRC, TRCK, TCON, TCOP, TYER, TLEN
+from mutagen.oggopus import OggOpus
+from mutagen.mp4 import MP4
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TPE2, COMM, TDRC, TRCK, TCON, TCOP, TYER, TLEN
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 CONFIG = load_config()
 
-def get_last_livestream_data(limit: int = 10) -> Generator[Dict[str, Any], None, None]:
-    """Fetches the last livestream data from a YouTube channel."""
+_youtube_client = None
+_youtube_client_key = None
+# Everything touching the API client goes through this lock; httplib2 is not thread-safe.
+_youtube_lock = threading.Lock()
+
+def get_youtube_client():
+    """Returns a long-lived YouTube API client, built once per API key."""
+    global _youtube_client, _youtube_client_key
+    api_key = CONFIG["YOUTUBE_API_KEY"]
+    if _youtube_client is None or _youtube_client_key != api_key:
+        _youtube_client = googleapiclient.discovery.build(
+            "youtube", "v3", developerKey=api_key, cache_discovery=False)
+        _youtube_client_key = api_key
+    return _youtube_client
+
+
+class LivestreamCache:
+    """
+    Livestream lookups kept in memory for `ttl` seconds. Refreshes send the last ETag
+    (a 304 costs no new data), and video details are only fetched for ids not seen before.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.channel_id = None
+        self.videos: Dict[str, Optional[Dict[str, Any]]] = {}  # id -> livestream entry, None if not a livestream
+        self.live: set = set()  # ids still live or upcoming; their length changes, so they are re-fetched
+        self.order: Dict[int, list] = {}  # search size -> video ids, newest first
+        self.etags: Dict[int, str] = {}
+        self.fetched_at: Dict[int, float] = {}
+        # Uploads playlist discovery: ids paged in so far (newest first) and where to continue
+        self.uploads_playlist: Optional[str] = None
+        self.uploads: list = []
+        self.uploads_page_token: Optional[str] = None
+        self.uploads_exhausted = False
+        self.uploads_etag: Optional[str] = None
+        self.uploads_fetched_at: Optional[float] = None
+
+    def reset_if_channel_changed(self, channel_id: str):
+        if channel_id != self.channel_id:
+            self.__init__(self.ttl)
+            self.channel_id = channel_id
+
+    def is_fresh(self, size: int) -> bool:
+        return size in self.fetched_at and time.monotonic() - self.fetched_at[size] < self.ttl
+
+    def livestreams(self, size: int, limit: int) -> list:
+        entries = (self.videos.get(video_id) for video_id in self.order.get(size, []))
+        return [entry for entry in entries if entry][:limit]
+
+    def uploads_fresh(self) -> bool:
+        return self.uploads_fetched_at is not None and time.monotonic() - self.uploads_fetched_at < self.ttl
+
+    def uploaded_livestreams(self, after: Optional[str] = None) -> list:
+        """Livestreams among the paged-in uploads, starting after the video id `after`."""
+        ids = self.uploads
+        if after in ids:
+            ids = ids[ids.index(after) + 1:]
+        entries = (self.videos.get(video_id) for video_id in ids)
+        return [entry for entry in entries if entry]
+
+
+_livestream_cache = LivestreamCache(ttl=float(CONFIG.get("livestream_cache_ttl", 300)))
+
+
+def config_changed():
+    """Applies a new livestream cache lifetime after the configuration was reloaded."""
+    _livestream_cache.ttl = float(CONFIG.get("livestream_cache_ttl", 300))
+
+def _livestream_entry(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Converts a videos().list item into our livestream dict, or None if it isn't a livestream."""
+    if 'liveStreamingDetails' not in item:
+        return None
+    duration_seconds = isodate.parse_duration(item['contentDetails']['duration']).total_seconds()
+    return {
+        "id": item['id'],
+        "title": item['snippet']['title'],
+        "url": item['snippet']['thumbnails']['high']['url'],
+        "length": int(duration_seconds * 1000)
+    }
+
+def _fetch_video_details(youtube, video_ids: list):
+    """Fetches details for ids not cached yet (50 per request, the API maximum)."""
+    missing = [video_id for video_id in video_ids
+               if video_id not in _livestream_cache.videos or video_id in _livestream_cache.live]
+    for i in range(0, len(missing), 50):
+        batch = missing[i:i + 50]
+        response = youtube.videos().list(
+            part="contentDetails,snippet,liveStreamingDetails",
+            id=",".join(batch)
+        ).execute()
+        for item in response.get('items', []):
+            _livestream_cache.videos[item['id']] = _livestream_entry(item)
+            if 'actualEndTime' in item.get('liveStreamingDetails', {'actualEndTime': None}):
+                _livestream_cache.live.discard(item['id'])
+            else:
+                _livestream_cache.live.add(item['id'])
+        for video_id in batch:
+            _livestream_cache.videos.setdefault(video_id, None)
+
+def _refresh_livestreams(size: int):
+    youtube = get_youtube_client()
+    request = youtube.search().list(
+        part="id",
+        channelId=CONFIG["channel_id"],
+        maxResults=size,
+        order="date",
+        type="video"
+    )
+    if size in _livestream_cache.etags:
+        request.headers['If-None-Match'] = _livestream_cache.etags[size]
     try:
-        api_service_name = "youtube"
-        api_version = "v3"
-        youtube = googleapiclient.discovery.build(
-            api_service_name, api_version, developerKey=CONFIG["YOUTUBE_API_KEY"])
-
-        request = youtube.search().list(
-            part="snippet",
-            channelId=CONFIG["channel_id"],
-            maxResults=limit * 2,  # Get more to filter
-            order="date",
-            type="video"
-        )
         response = request.execute()
+    except googleapiclient.errors.HttpError as e:
+        if e.resp.status != 304:
+            raise
+        logging.info("Livestream list unchanged (304)")
+    else:
+        _livestream_cache.etags[size] = response.get('etag')
+        _livestream_cache.order[size] = [item['id']['videoId'] for item in response.get('items', [])]
+        _fetch_video_details(youtube, _livestream_cache.order[size])
+    _livestream_cache.fetched_at[size] = time.monotonic()
 
-        video_ids = [item['id']['videoId'] for item in response.get('items', [])]
-        if not video_ids:
-            logging.warning("No videos found")
-            return
+def _uploads_playlist_id(youtube) -> str:
+    if _livestream_cache.uploads_playlist is None:
+        response = youtube.channels().list(part="contentDetails", id=CONFIG["channel_id"]).execute()
+        _livestream_cache.uploads_playlist = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+    return _livestream_cache.uploads_playlist
 
-        video_request = youtube.videos().list(
-            part="contentDetails,snippet,liveStreamingDetails",  # Add liveStreamingDetails
-            id=",".join(video_ids)
-        )
-        video_response = video_request.execute()
-        
-        livestream_count = 0
-        for item in video_response.get('items', []):
-            # Check if it's a livestream
-            if 'liveStreamingDetails' not in item:
-                continue  # Skip non-livestreams
-                
-            if livestream_count >= limit:
-                break
-                
-            video_id = item['id']
-            video_title = item['snippet']['title']
-            video_thumbnail = item['snippet']['thumbnails']['high']['url']
-            duration_iso = item['contentDetails']['duration']
-            duration_seconds = isodate.parse_duration(duration_iso).total_seconds()
-
-            yield {
-                "id": video_id,
-                "title": video_title,
-                "url": video_thumbnail,
-                "length": int(duration_seconds * 1000)
-            }
-            
-            livestream_count += 1
+def _fetch_uploads_page(youtube, page_token: Optional[str] = None, etag: Optional[str] = None):
+    """One page (50 ids) of the channel's uploads playlist, 1 quota unit. Returns None on 304."""
+    request = youtube.playlistItems().list(
+        part="contentDetails",
+        playlistId=_uploads_playlist_id(youtube),
+        maxResults=50,
+        pageToken=page_token
+    )
+    if etag:
+        request.headers['If-None-Match'] = etag
+    try:
+        return request.execute()
+    except googleapiclient.errors.HttpError as e:
+        if e.resp.status == 304:
+            return None
+        raise
+
+def _refresh_uploads(youtube):
+    """Checks the first uploads page for new videos and puts them in front of the known ones."""
+    cache = _livestream_cache
+    response = _fetch_uploads_page(youtube, etag=cache.uploads_etag if cache.uploads else None)
+    if response is not None:
+        ids = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+        if not cache.uploads:
+            cache.uploads = ids
+            cache.uploads_page_token = response.get('nextPageToken')
+            cache.uploads_exhausted = cache.uploads_page_token is None
+        else:
+            cache.uploads = [i for i in ids if i not in cache.uploads] + cache.uploads
+        cache.uploads_etag = response.get('etag')
+        _fetch_video_details(youtube, ids)
+    else:
+        # Unchanged, but streams that were live may have ended meanwhile
+        _fetch_video_details(youtube, [i for i in cache.uploads if i in cache.live])
+    cache.uploads_fetched_at = time.monotonic()
+
+def _page_until(youtube, after: Optional[str], limit: int):
+    """Pages through older uploads until `limit` livestreams after `after` are known."""
+    cache = _livestream_cache
+    while not cache.uploads_exhausted and (
+            (after and after not in cache.uploads) or len(cache.uploaded_livestreams(after)) < limit):
+        response = _fetch_uploads_page(youtube, cache.uploads_page_token)
+        ids = [item['contentDetails']['videoId'] for item in response.get('items', [])]
+        cache.uploads.extend(i for i in ids if i not in cache.uploads)
+        cache.uploads_page_token = response.get('nextPageToken')
+        cache.uploads_exhausted = cache.uploads_page_token is None
+        _fetch_video_details(youtube, ids)
+
+def get_livestreams_page(limit: int = 10, cursor: Optional[str] = None) -> tuple:
+    """
+    Returns (livestreams, next_cursor). The cursor is the id of the last livestream returned;
+    pass it back to continue with older services. With `livestream_discovery` set to "search"
+    the old search-based lookup is used, which has no further pages.
+    """
+    with _youtube_lock:
+        _livestream_cache.reset_if_channel_changed(CONFIG["channel_id"])
+        if CONFIG.get("livestream_discovery", "uploads") == "search":
+            size = min(limit * 2, 50)  # Get more to filter
+            if not _livestream_cache.is_fresh(size):
+                _refresh_livestreams(size)
+            return _livestream_cache.livestreams(size, limit), None
+
+        youtube = get_youtube_client()
+        if not _livestream_cache.uploads_fresh():
+            _refresh_uploads(youtube)
+        _page_until(youtube, cursor, limit)
+        available = _livestream_cache.uploaded_livestreams(cursor)
+        livestreams = available[:limit]
+        more = len(available) > limit or not _livestream_cache.uploads_exhausted
+        next_cursor = livestreams[-1]["id"] if livestreams and more else None
+        return livestreams, next_cursor
+
+def get_last_livestream_data(limit: int = 10, cursor: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+    """Fetches the last livestream data from a YouTube channel, answered from memory while fresh."""
+    try:
+        livestreams, _ = get_livestreams_page(limit, cursor)
+        if not livestreams:
+            logging.warning("No videos found")
+        yield from livestreams
             
     except Exception as e:
         logging.error(f"Error fetching YouTube livestreams: {e}")
         return
 
 
-def download_youtube(video_url: str, temp_dir: str) -> str:
-    """Downloads audio from a YouTube URL and returns the file path."""
+def download_youtube(video_url: str, temp_dir: str, transcode: bool = True, progress_hook=None,
+                     start: Optional[float] = None, end: Optional[float] = None) -> str:
+    """Downloads audio from a YouTube URL and returns the file path.
+
+    With ``transcode=False`` the native bestaudio stream (opus/m4a) is kept as-is,
+    so the only encode happens later in ``compress_audio``.
+    ``progress_hook`` is passed to yt-dlp; raising from it aborts the download.
+    ``start``/``end`` (seconds) restrict the download to that section of the video.
+    """
     
     file_path = os.path.join(temp_dir, 'temp_audio.mp3')
     
     try:
-        ffmpeg_location = get_ffmpeg_path()
+        ffmpeg_location = get_toolkit().location
         print(f"FFmpeg location: {ffmpeg_location}")
     except FileNotFoundError as e:
         logging.error(f"FFmpeg setup failed: {e}")
@@ -89,63 +261,333 @@ def download_youtube(video_url: str, temp_dir: str) -> str:
 
     ydl_opts = {
         'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
         'outtmpl': os.path.join(temp_dir, 'temp_audio'),
         'nocheckcertificate': True,
     }
+    if progress_hook:
+        ydl_opts['progress_hooks'] = [progress_hook]
+    if start is not None or end is not None:
+        # Only the requested section is fetched (and cut by ffmpeg inside yt-dlp)
+        ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(
+            None, [(start or 0, end if end is not None else float('inf'))])
+    if transcode:
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }]
+    else:
+        ydl_opts['outtmpl'] = os.path.join(temp_dir, 'temp_audio.%(ext)s')
     
     if ffmpeg_location:
         ydl_opts['ffmpeg_location'] = ffmpeg_location
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         try:
-            ydl.download([video_url])
+            if transcode:
+                ydl.download([video_url])
+            else:
+                info = ydl.extract_info(video_url, download=True)
+                file_path = ydl.prepare_filename(info)
             logging.info(f"Download complete: {file_path}")
             return file_path
         except Exception as e:
             logging.error(f"Error in yt_dlp download: {e}")
             raise
 
-def compress_audio(file_path: str, output_path: str) -> Generator[Dict[str, Any], None, None]:
-    """Compresses audio using ffmpeg-python."""
+def get_audio_duration(file_path: str) -> Optional[float]:
+    """Returns the duration of a media file in seconds, or None if it can't be probed."""
+    try:
+        return float(ffmpeg.probe(file_path, cmd=get_toolkit().ffprobe)['format']['duration'])
+    except Exception as e:
+        logging.warning(f"Could not determine duration of {file_path}: {e}")
+        return None
+
+def _format_eta(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes}:{secs:02d}"
+
+def read_ffmpeg_progress(process, duration: Optional[float],
+                         output_lines: Optional[List[str]] = None) -> Generator[Dict[str, Any], None, None]:
+    """
+    Parses the key=value blocks ffmpeg writes with `-progress pipe:2` and yields
+    one dict per block. Lines that are not progress output are collected as error text,
+    and into `output_lines` if given (e.g. for filters that log their results).
+    """
+    block: Dict[str, str] = {}
+    errors = output_lines if output_lines is not None else []
+    for raw_line in process.stderr:
+        line = raw_line.decode(errors='replace').strip()
+        key, sep, value = line.partition('=')
+        if not sep or ' ' in key:
+            if line:
+                errors.append(line)
+            continue
+        block[key] = value
+        if key != 'progress':
+            continue
+
+        out_time = None
+        try:
+            out_time = int(block.get('out_time_us') or block.get('out_time_ms')) / 1_000_000
+        except (TypeError, ValueError):
+            pass
+        try:
+            speed = float(block.get('speed', '').rstrip('x'))
+        except ValueError:
+            speed = None
+
+        update: Dict[str, Any] = {"out_time": out_time, "speed": speed, "percent": None, "eta": None}
+        if duration and out_time is not None:
+            update["percent"] = max(0.0, min(100.0, out_time / duration * 100))
+            if speed:
+                update["eta"] = max(0.0, (duration - out_time) / speed)
+        if value == 'end':
+            update["percent"] = 100.0
+            update["eta"] = 0.0
+        yield update
+        block = {}
+    process.wait()
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, "\n".join(errors).encode())
+
+def get_stream_url(video_url: str) -> str:
+    """Resolves the direct URL of the best audio stream, so ffmpeg can read it without a download."""
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'nocheckcertificate': True,
+        'quiet': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+    return info['url']
+
+def compressor_settings(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Returns the compressor/encoder settings from the config, optionally overridden."""
+    settings = {
+        "threshold_db": CONFIG.get("threshold_db", -12),
+        "ratio": CONFIG.get("ratio", 2),
+        "attack": CONFIG.get("attack", 200),
+        "release": CONFIG.get("release", 1000),
+        "bitrate": CONFIG.get("bitrate", "128k"),
+        # EBU R128 normalization ahead of the compressor; None disables it
+        "loudness_target": CONFIG.get("loudness_target"),
+        "true_peak": CONFIG.get("true_peak", -1.5),
+    }
+    if overrides:
+        settings.update({k: v for k, v in overrides.items() if k in settings and v is not None})
+    if settings["loudness_target"] is not None and not get_toolkit().has_filter("loudnorm"):
+        logging.warning("This ffmpeg build has no loudnorm filter, skipping loudness normalization")
+        settings["loudness_target"] = None
+    return settings
+
+# File extension per rendition codec; the encoder is picked from what the ffmpeg build offers
+RENDITION_EXTENSIONS = {
+    "mp3": ".mp3",
+    "opus": ".opus",
+    "aac": ".m4a",
+}
+
+def rendition_extension(profile: Dict[str, Any]) -> str:
+    return RENDITION_EXTENSIONS[profile.get("codec", "mp3")]
+
+def _rendition_args(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """ffmpeg output options for a rendition profile (codec, bitrate, channels)."""
+    args = {**get_toolkit().encoder_args(profile.get("codec", "mp3")), 'audio_bitrate': profile["bitrate"]}
+    if profile.get("channels"):
+        args['ac'] = profile["channels"]
+    return args
+
+def _compressed(stream, settings: Dict[str, Any], gain_db: Optional[float] = None):
+    """Applies the normalization gain (if any) and the compressor to an ffmpeg-python audio stream."""
+    if gain_db is not None:
+        stream = stream.filter('volume', f'{gain_db:.2f}dB')
+    return stream.filter('acompressor', threshold=f'{settings["threshold_db"]}dB', ratio=settings["ratio"],
+                         attack=settings["attack"], release=settings["release"])
+
+def compressor_filter(settings: Dict[str, Any], gain_db: Optional[float] = None) -> str:
+    """The ffmpeg filter chain for the given compressor settings and normalization gain."""
+    chain = (f'acompressor=threshold={settings["threshold_db"]}dB:ratio={settings["ratio"]}'
+             f':attack={settings["attack"]}:release={settings["release"]}')
+    return f'volume={gain_db:.2f}dB,{chain}' if gain_db is not None else chain
+
+def measure_loudness(file_path: str, duration: Optional[float] = None,
+                     start: Optional[float] = None, end: Optional[float] = None
+                     ) -> Generator[Dict[str, Any], None, None]:
+    """
+    First normalization pass: measures the EBU R128 loudness of `file_path` (or its
+    `start`/`end` section) with ffmpeg's loudnorm filter. Yields progress updates; the
+    last update carries the measurement (input_i, input_tp, input_lra, input_thresh).
+    """
+    ffmpeg_executable = get_toolkit().ffmpeg
+    input_args = {}
+    if start:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    if duration and (start or end is not None):
+        duration = min(end if end is not None else duration, duration) - (start or 0)
+
+    process = (
+        ffmpeg
+        .input(file_path, **input_args)
+        .output('-', format='null', af='loudnorm=print_format=json', vn=None)
+        # loudnorm logs its summary at info level
+        .global_args('-nostats', '-loglevel', 'info', '-progress', 'pipe:2')
+        .run_async(cmd=ffmpeg_executable, pipe_stderr=True)
+    )
+    lines: List[str] = []
+    try:
+        for update in read_ffmpeg_progress(process, duration, lines):
+            if update["percent"] is not None:
+                yield {
+                    "step": "Measuring",
+                    "status": "in_progress",
+                    "percent": round(update["percent"], 1),
+                    "message": f"Measuring loudness... {update['percent']:.0f}%"
+                }
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    # The summary is the last JSON object in the log
+    text = "\n".join(lines)
+    summary = json.loads(text[text.rindex('{'):text.rindex('}') + 1])
+    measurement = {key: float(summary[key]) for key in ("input_i", "input_tp", "input_lra", "input_thresh")}
+    logging.info(f"Loudness of {file_path}: {measurement}")
+    yield {
+        "step": "Measuring",
+        "status": "completed",
+        "percent": 100.0,
+        "message": f"Loudness measured: {measurement['input_i']:.1f} LUFS",
+        "measurement": measurement
+    }
+
+# Quiet sources are only lifted this far; more would mostly amplify the noise floor
+MAX_NORMALIZATION_GAIN = 20.0
+
+def normalization_gain(measurement: Dict[str, float], settings: Dict[str, Any]) -> Optional[float]:
+    """
+    Second pass: the linear gain (dB) that brings the measured loudness to the target,
+    limited so the true peak stays below `true_peak` and capped at MAX_NORMALIZATION_GAIN.
+    A plain gain keeps the source's sample rate and dynamics untouched, unlike loudnorm's
+    dynamic mode. Returns None if the loudness could not be measured (e.g. silence, -inf).
+    """
+    if not all(math.isfinite(measurement[field]) for field in ("input_i", "input_tp")):
+        return None
+    gain = settings["loudness_target"] - measurement["input_i"]
+    return min(gain, settings["true_peak"] - measurement["input_tp"], MAX_NORMALIZATION_GAIN)
+
+def compress_audio(file_path: str, output_path: str, duration: Optional[float] = None,
+                   settings: Optional[Dict[str, Any]] = None,
+                   start: Optional[float] = None, end: Optional[float] = None,
+                   sink=None, renditions: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+                   gain_db: Optional[float] = None, pcm_sink=None,
+                   pcm_rate: int = 8000) -> Generator[Dict[str, Any], None, None]:
+    """
+    Compresses audio using ffmpeg-python.
+    Yields progress updates (percent, ETA, speed) while ffmpeg is running; `duration` is the
+    expected length in seconds of the input and is probed from the file if not given.
+    `settings` defaults to the current `compressor_settings()`.
+    `start`/`end` (seconds) trim the input so only that section is decoded and encoded.
+    If `sink` is given, the raw MP3 frames (no ID3/Xing header) are streamed from ffmpeg and
+    passed to `sink(chunk)` as they are encoded instead of being written to `output_path`.
+    `renditions` is a list of (path, profile) for additional outputs; they share the decode and
+    the compressor with the main MP3 and are encoded in the same ffmpeg run.
+    `gain_db` is the loudness normalization gain, applied in front of the compressor.
+    `pcm_sink(chunk)` receives the compressed audio as s16le mono PCM at `pcm_rate` while it is
+    encoded (e.g. for waveform peaks). It uses ffmpeg's stdout, so it can't be combined with `sink`.
+    """
+    if sink is not None and pcm_sink is not None:
+        raise ValueError("sink and pcm_sink can't be used together")
     yield {
         "step": "Compressing",
         "status": "in_progress",
+        "percent": 0.0,
         "message": "Applying audio compression..."
     }
     try:
-        ffmpeg_location = get_ffmpeg_path()
-        print(f"FFmpeg location: {ffmpeg_location}")
+        # Bundled FFmpeg if available, otherwise the one on the system PATH
+        toolkit = get_toolkit()
+        ffmpeg_executable = toolkit.ffmpeg
 
-        ffmpeg_cmd = ffmpeg.input(file_path)
-        if ffmpeg_location:
-            # Use bundled FFmpeg
-            ffmpeg_executable = str(Path(ffmpeg_location) / 'ffmpeg.exe')
-            (
-                ffmpeg_cmd
-                .output(output_path, acodec='libmp3lame', audio_bitrate='128k',
-                        af=f'acompressor=threshold={CONFIG["threshold_db"]}dB:ratio={CONFIG["ratio"]}:attack={CONFIG["attack"]}:release={CONFIG["release"]}')
-                .overwrite_output()
-                .run(cmd=ffmpeg_executable, capture_stdout=True, capture_stderr=True)
-            )
-        else:
-            # Use system FFmpeg
-            (
-                ffmpeg_cmd
-                .output(output_path, acodec='libmp3lame', audio_bitrate='128k',
-                        af=f'acompressor=threshold={CONFIG["threshold_db"]}dB:ratio={CONFIG["ratio"]}:attack={CONFIG["attack"]}:release={CONFIG["release"]}')
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
+        if not duration:
+            duration = get_audio_duration(file_path)
+        settings = settings or compressor_settings()
+
+        input_args = {}
+        if start:
+            input_args['ss'] = start
+        if end is not None:
+            input_args['to'] = end
+        if duration and (start or end is not None):
+            duration = min(end if end is not None else duration, duration) - (start or 0)
+
+        output_args = {}
+        if sink is not None:
+            # Raw frames only: a Xing header can't be patched in on a pipe, tags are prepended by the caller
+            output_args = {'format': 'mp3', 'write_xing': 0, 'id3v2_version': 0}
+        audio = _compressed(ffmpeg.input(file_path, **input_args).audio, settings, gain_db)
+        branch_count = 1 + len(renditions or []) + (1 if pcm_sink is not None else 0)
+        branches = audio.filter_multi_output('asplit', branch_count) if branch_count > 1 else None
+        outputs = [ffmpeg.output(branches[0] if branches is not None else audio,
+                                 'pipe:' if sink is not None else output_path,
+                                 audio_bitrate=settings["bitrate"], **toolkit.encoder_args("mp3"), **output_args)]
+        for i, (path, profile) in enumerate(renditions or []):
+            outputs.append(ffmpeg.output(branches[i + 1], path, **_rendition_args(profile)))
+        if pcm_sink is not None:
+            outputs.append(ffmpeg.output(branches[-1], 'pipe:', format='s16le', acodec='pcm_s16le',
+                                         ac=1, ar=pcm_rate))
+        stdout_sink = sink if sink is not None else pcm_sink
+        process = (
+            ffmpeg
+            .merge_outputs(*outputs)
+            .global_args('-nostats', '-loglevel', 'error', '-progress', 'pipe:2')
+            .overwrite_output()
+            .run_async(cmd=ffmpeg_executable, pipe_stdout=stdout_sink is not None, pipe_stderr=True)
+        )
+        tee_errors = []
+        tee = None
+        if stdout_sink is not None:
+            def tee_output():
+                try:
+                    for chunk in iter(lambda: process.stdout.read(64 * 1024), b''):
+                        stdout_sink(chunk)
+                except Exception as e:
+                    tee_errors.append(e)
+                    process.kill()
+            tee = threading.Thread(target=tee_output, daemon=True)
+            tee.start()
+        try:
+            for update in read_ffmpeg_progress(process, duration):
+                if update["percent"] is None:
+                    continue
+                message = f"Compressing... {update['percent']:.0f}%"
+                if update["eta"] is not None:
+                    message += f" (ETA {_format_eta(update['eta'])})"
+                yield {
+                    "step": "Compressing",
+                    "status": "in_progress",
+                    "percent": round(update["percent"], 1),
+                    "eta": round(update["eta"], 1) if update["eta"] is not None else None,
+                    "speed": update["speed"],
+                    "message": message
+                }
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if tee is not None:
+                tee.join()
+            # A failing sink kills ffmpeg; report that rather than ffmpeg's exit code
+            if tee_errors:
+                raise tee_errors[0]
         
         yield {
             "step": "Compressing",
-            "progress": "60",
             "status": "completed",
+            "percent": 100.0,
             "message": "Audio compression successful."
         }
     except ffmpeg.Error as e:
@@ -174,6 +616,89 @@ def compress_audio(file_path: str, output_path: str) -> Generator[Dict[str, Any]
         }
         raise
 
+def render_preview(file_path: str, offset: float, length: float, output_dir: str,
+                   settings: Optional[Dict[str, Any]] = None, gain_db: Optional[float] = None) -> Dict[str, str]:
+    """
+    Renders a short excerpt of `file_path` starting at `offset` seconds twice: as is and
+    through the compressor, both encoded at the same bitrate so only the compression differs.
+    The seek happens on the input, so ffmpeg jumps there through the container index
+    instead of decoding everything before it. Both versions come from a single decode.
+    `gain_db` (loudness normalization) applies to the compressed version only.
+    Returns the paths of the "original" and "compressed" MP3 files; existing renders are reused.
+    """
+    settings = settings or compressor_settings()
+    excerpt = json.dumps([file_path, os.path.getsize(file_path), offset, length, settings["bitrate"]])
+    original_name = hashlib.sha256(excerpt.encode()).hexdigest()[:24]
+    compressed_name = hashlib.sha256(f"{excerpt}|{compressor_filter(settings, gain_db)}".encode()).hexdigest()[:24]
+    paths = {
+        "original": os.path.join(output_dir, f"{original_name}.mp3"),
+        "compressed": os.path.join(output_dir, f"{compressed_name}.mp3"),
+    }
+    missing = {kind: path for kind, path in paths.items() if not os.path.exists(path)}
+    for kind in paths.keys() - missing.keys():
+        os.utime(paths[kind])  # keeps reused renders from being evicted first
+    if not missing:
+        return paths
+
+    toolkit = get_toolkit()
+    os.makedirs(output_dir, exist_ok=True)
+
+    audio = ffmpeg.input(file_path, ss=offset, t=length).audio
+    branches = audio.filter_multi_output('asplit', len(missing)) if len(missing) > 1 else None
+    outputs = []
+    for i, (kind, path) in enumerate(missing.items()):
+        branch = branches[i] if branches is not None else audio
+        if kind == "compressed":
+            branch = _compressed(branch, settings, gain_db)
+        # Render next to the target and move it in place, so a half-written preview is never served
+        outputs.append(ffmpeg.output(branch, f"{path}.part", format='mp3', audio_bitrate=settings["bitrate"],
+                                     **toolkit.encoder_args("mp3")))
+    try:
+        (
+            ffmpeg
+            .merge_outputs(*outputs)
+            .global_args('-nostats', '-loglevel', 'error')
+            .overwrite_output()
+            .run(cmd=toolkit.ffmpeg, capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        logging.error(f"FFmpeg Error while rendering preview: {e.stderr.decode() if e.stderr else e}")
+        for path in missing.values():
+            if os.path.exists(f"{path}.part"):
+                os.remove(f"{path}.part")
+        raise
+    for path in missing.values():
+        os.replace(f"{path}.part", path)
+    return paths
+
+def _id3_frames(metadata: Dict[str, str]) -> list:
+    """The ID3 frames for a sermon, without TLEN (that depends on the audio)."""
+    return [
+        TIT2(encoding=3, text=metadata.get("title", "")),
+        TPE1(encoding=3, text=metadata.get("speaker", "")),
+        TDRC(encoding=3, text=metadata.get("date", "")), # YYYY-MM-DD
+        TYER(encoding=3, text=metadata.get("year", "")),
+
+        # Static tags
+        TALB(encoding=3, text=metadata.get("album", "Predigten aus Treffpunkt Leben Karlsruhe")),
+        TCON(encoding=3, text=metadata.get("genre", "Predigt Online")),
+        TCOP(encoding=3, text=metadata.get("copyright", "Treffpunkt Leben Karlsruhe - alle Rechte vorbehalten")),
+    ]
+
+def build_id3_header(metadata: Dict[str, str], duration_ms: Optional[int] = None) -> bytes:
+    """
+    Renders a standalone ID3v2 tag, to be written in front of raw MP3 frames
+    when the audio is streamed and can't be tagged in place afterwards.
+    """
+    tags = ID3()
+    for frame in _id3_frames(metadata):
+        tags.add(frame)
+    if duration_ms:
+        tags.add(TLEN(encoding=3, text=str(duration_ms)))
+    buffer = io.BytesIO()
+    tags.save(buffer, padding=lambda info: 0)
+    return buffer.getvalue()
+
 def generate_id3_tags(file_path: str, metadata: Dict[str, str]) -> Generator[Dict[str, Any], None, None]:
     """Generates and applies ID3 tags to an MP3 file."""
     yield {
@@ -184,15 +709,8 @@ def generate_id3_tags(file_path: str, metadata: Dict[str, str]) -> Generator[Dic
     try:
         audio = MP3(file_path)
         
-        audio['TIT2'] = TIT2(encoding=3, text=metadata.get("title", ""))
-        audio['TPE1'] = TPE1(encoding=3, text=metadata.get("speaker", ""))
-        audio['TDRC'] = TDRC(encoding=3, text=metadata.get("date", "")) # YYYY-MM-DD
-        audio['TYER'] = TYER(encoding=3, text=metadata.get("year", ""))
-
-        # Set static tags
-        audio['TALB'] = TALB(encoding=3, text=metadata.get("album", "Predigten aus Treffpunkt Leben Karlsruhe"))
-        audio['TCON'] = TCON(encoding=3, text=metadata.get("genre", "Predigt Online"))
-        audio['TCOP'] = TCOP(encoding=3, text=metadata.get("copyright", "Treffpunkt Leben Karlsruhe - alle Rechte vorbehalten"))
+        for frame in _id3_frames(metadata):
+            audio[frame.FrameID] = frame
 
         # Calculate and set duration
         duration_ms = int(audio.info.length * 1000)
@@ -213,6 +731,29 @@ def generate_id3_tags(file_path: str, metadata: Dict[str, str]) -> Generator[Dic
         }
         raise
 
+def tag_rendition(file_path: str, metadata: Dict[str, str]):
+    """Tags a rendition in its container's own format: ID3 for MP3, Vorbis comments for Opus, MP4 atoms for AAC."""
+    extension = Path(file_path).suffix
+    if extension == ".mp3":
+        for _ in generate_id3_tags(file_path, metadata):
+            pass
+        return
+    if extension == ".opus":
+        audio = OggOpus(file_path)
+        keys = {"title": "title", "speaker": "artist", "date": "date", "album": "album",
+                "genre": "genre", "copyright": "copyright"}
+    elif extension == ".m4a":
+        audio = MP4(file_path)
+        keys = {"title": "\xa9nam", "speaker": "\xa9ART", "date": "\xa9day", "album": "\xa9alb",
+                "genre": "\xa9gen", "copyright": "cprt"}
+    else:
+        raise ValueError(f"Don't know how to tag {file_path}")
+    for field, key in keys.items():
+        if metadata.get(field):
+            audio[key] = [metadata[field]]
+    audio.save()
+    logging.info(f"Tagged {file_path}")
+
 def rename_file(original_path: str, new_name: str) -> str:
     """Renames the file to its final name and returns the new path."""
     try:
@@ -0,0 +1,157 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, AsyncGenerator
+
+# Events kept per job for replays to reconnecting clients
+HISTORY = 200
+TERMINAL_STEPS = ("complete", "error")
+
+
+def _numeric_progress(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def typed_event(job_id: str, event: Dict[str, Any], seq: int) -> Dict[str, Any]:
+    """An event as the bus hands it out: sequence number, job id, timestamp and numeric progress (0-100)."""
+    return {**event, "seq": seq, "job_id": job_id, "time": round(time.time(), 3),
+            "progress": _numeric_progress(event.get("progress"))}
+
+
+def ndjson_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """The event in the format of the NDJSON streams, whose clients parse progress from a string."""
+    event = dict(event)
+    if event.get("progress") is None:
+        event.pop("progress", None)
+    else:
+        event["progress"] = f"{event['progress']:.0f}"
+    return event
+
+
+class EventBus:
+    """
+    Progress events of all jobs. Every event gets a sequence number that only grows; it
+    starts at the wall clock in milliseconds, or after the last one of the previous run if
+    that is higher (see `seed`), so it keeps growing across restarts and clock steps and a
+    client's Last-Event-ID stays meaningful. A job's progress never moves backwards: events
+    below (or without) the job's last progress carry that progress instead, until `clear`
+    starts the job over. Each job keeps its last events in a ring buffer for replays.
+    Publishing appends under a short lock and schedules the delivery on the subscribers'
+    event loops, so worker threads never wait for a client.
+    """
+
+    def __init__(self, history: int = HISTORY):
+        self._history_size = history
+        self._lock = threading.Lock()
+        self._last_seq = int(time.time() * 1000) - 1
+        self._history: Dict[str, deque] = {}
+        self._progress: Dict[str, float] = {}
+        self._subscribers: List[tuple] = []  # (job id or None for all jobs, queue, loop)
+
+    def seed(self, last_seq: int):
+        """Makes the next sequence number larger than `last_seq`, e.g. the highest one persisted before a restart."""
+        with self._lock:
+            self._last_seq = max(self._last_seq, last_seq)
+
+    @property
+    def last_seq(self) -> int:
+        """The sequence number of the most recent event."""
+        with self._lock:
+            return self._last_seq
+
+    def publish(self, job_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._last_seq += 1
+            event = typed_event(job_id, event, self._last_seq)
+            last = self._progress.get(job_id)
+            if last is not None and (event["progress"] is None or event["progress"] < last):
+                event["progress"] = last
+            if event["progress"] is not None:
+                self._progress[job_id] = event["progress"]
+            if job_id not in self._history:
+                self._history[job_id] = deque(maxlen=self._history_size)
+            self._history[job_id].append(event)
+            subscribers = [(queue, loop) for subscribed, queue, loop in self._subscribers
+                           if subscribed is None or subscribed == job_id]
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop is gone (shutdown); it unsubscribes with it
+                logging.debug(f"Dropped event {event['seq']} for a closed event loop")
+        return event
+
+    def clear(self, job_id: str):
+        """Forgets the recent events and the progress of a job, e.g. before it is resumed."""
+        with self._lock:
+            self._history.pop(job_id, None)
+            self._progress.pop(job_id, None)
+
+    def _replay(self, job_id: Optional[str], after: Optional[int]) -> List[Dict[str, Any]]:
+        if job_id is not None:
+            events = list(self._history.get(job_id, ()))
+        else:
+            events = sorted((e for history in self._history.values() for e in history), key=lambda e: e["seq"])
+        return [e for e in events if after is None or e["seq"] > after]
+
+    def history(self, job_id: Optional[str] = None, after: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recent events of one job or all jobs, oldest first, optionally only those after sequence number `after`."""
+        with self._lock:
+            return self._replay(job_id, after)
+
+    @contextmanager
+    def listen(self, job_id: Optional[str] = None, after: Optional[int] = None):
+        """
+        Subscribes the running event loop to one job (or all jobs with None). Yields the
+        replay of recent events after `after` and a queue that receives the live events
+        from then on; taken under one lock, so nothing is missed or delivered twice.
+        """
+        entry = (job_id, asyncio.Queue(), asyncio.get_running_loop())
+        with self._lock:
+            replay = self._replay(job_id, after)
+            self._subscribers.append(entry)
+        try:
+            yield replay, entry[1]
+        finally:
+            with self._lock:
+                self._subscribers.remove(entry)
+
+
+bus = EventBus()
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+
+
+async def sse_stream(job_id: Optional[str] = None, after: Optional[int] = None,
+                     keepalive: float = 15) -> AsyncGenerator[str, None]:
+    """
+    Server-sent events of one job or all jobs: the recent events after `after` (the
+    client's Last-Event-ID), then live ones. A one-job stream ends after its final event;
+    comments keep idle connections from being closed by proxies.
+    """
+    yield "retry: 2000\n\n"
+    with bus.listen(job_id, after) as (replay, queue):
+        for event in replay:
+            yield format_sse(event)
+        if job_id is not None and replay and replay[-1].get("step") in TERMINAL_STEPS:
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+            if job_id is not None and event.get("step") in TERMINAL_STEPS:
+                return
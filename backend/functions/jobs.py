@@ -0,0 +1,758 @@
+import os
+import json
+import errno
+import uuid
+import time
+import shutil
+import sqlite3
+import asyncio
+import logging
+import threading
+import datetime as dt
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, AsyncGenerator
+
+from main import load_config
+from functions import lazy
+from functions import cache
+from functions import events
+# These pull in yt-dlp, ffmpeg and numpy; only running a job needs them, restoring jobs at startup doesn't
+download = lazy.lazy_import("functions.download")
+server_interact = lazy.lazy_import("functions.server_interact")
+parallel_encode = lazy.lazy_import("functions.parallel_encode")
+peaks = lazy.lazy_import("functions.peaks")
+from utils.setup_ffmpeg import get_toolkit
+
+CONFIG = load_config()
+
+BACKEND_DIR = Path(__file__).parent.parent
+DB_PATH = BACKEND_DIR / "jobs.db"
+PROCESSED_DIR = BACKEND_DIR / "processed_files"
+# Inside processed_files, so it is on the same volume even if that folder is moved or linked
+# elsewhere: finishing a job is then a rename, never a copy
+WORK_DIR = PROCESSED_DIR / ".work"
+LEGACY_WORK_DIR = BACKEND_DIR / "work"
+
+# Stages in execution order; a job's `stage` column holds the last one that completed.
+STAGES = ["download", "compress", "tags", "finalize"]
+ACTIVE_STATES = ("queued", "running")
+FINAL_STATES = ("completed", "failed", "cancelled")
+
+# Progress updates are persisted as the job's last event at most this often (seconds); status changes always
+PERSIST_INTERVAL = 2.0
+# Events of the last PERSIST_INTERVAL before a shutdown may not be stored; restart the sequence this far above
+SEQ_HEADROOM = 100_000
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when the job was cancelled."""
+
+
+class _JobRuntime:
+    """In-memory state of a job: the cancel flag and when its last event was persisted."""
+
+    def __init__(self):
+        self.cancel = threading.Event()
+        self.persisted_at = 0.0
+
+
+_runtimes: Dict[str, _JobRuntime] = {}
+_runtimes_lock = threading.Lock()
+_db_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+
+
+def _limit(key: str, default: int) -> int:
+    configured = CONFIG.get(key)
+    return max(1, int(configured)) if configured else default
+
+
+# Downloads are network-bound, encodes CPU-bound: each has its own limit, so the download
+# of one job overlaps the encode of another
+DOWNLOAD_SLOTS = _limit("max_concurrent_downloads", 2)
+ENCODE_SLOTS = _limit("max_concurrent_encodes", max(1, (os.cpu_count() or 2) // 2))
+_download_slots = threading.BoundedSemaphore(DOWNLOAD_SLOTS)
+_encode_slots = threading.BoundedSemaphore(ENCODE_SLOTS)
+
+
+def config_changed():
+    """
+    Applies new concurrency limits (called after the configuration was reloaded). Jobs
+    already holding or waiting for a slot finish on the old limits; the job executor is
+    replaced, and the old one still runs the jobs it already took.
+    """
+    global DOWNLOAD_SLOTS, ENCODE_SLOTS, _download_slots, _encode_slots, _executor
+    downloads = _limit("max_concurrent_downloads", 2)
+    encodes = _limit("max_concurrent_encodes", max(1, (os.cpu_count() or 2) // 2))
+    if downloads != DOWNLOAD_SLOTS:
+        DOWNLOAD_SLOTS, _download_slots = downloads, threading.BoundedSemaphore(downloads)
+    if encodes != ENCODE_SLOTS:
+        ENCODE_SLOTS, _encode_slots = encodes, threading.BoundedSemaphore(encodes)
+    if _executor is not None and _executor_workers != _max_workers():
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _max_workers() -> int:
+    """
+    Concurrency limit for jobs, configurable via `max_concurrent_jobs`. By default one job per
+    download and encode slot, so jobs waiting for an encode slot don't hold up downloads.
+    """
+    return _limit("max_concurrent_jobs", DOWNLOAD_SLOTS + ENCODE_SLOTS)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_workers
+    if _executor is None:
+        _executor_workers = _max_workers()
+        _executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix="job")
+    return _executor
+
+
+def _runtime(job_id: str) -> _JobRuntime:
+    with _runtimes_lock:
+        if job_id not in _runtimes:
+            _runtimes[job_id] = _JobRuntime()
+        return _runtimes[job_id]
+
+
+def _now() -> str:
+    return dt.datetime.now().isoformat(timespec="seconds")
+
+
+# --- Persistence ---
+
+@contextmanager
+def _db():
+    with _db_lock:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def init_db():
+    with _db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                artifacts TEXT NOT NULL DEFAULT '{}',
+                last_event TEXT,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        # First-pass loudness measurements per source (video section), reused by re-renders
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS loudness (
+                source_key TEXT PRIMARY KEY,
+                measurement TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        last_seq = conn.execute("SELECT MAX(json_extract(last_event, '$.seq')) FROM jobs").fetchone()[0]
+    # Event sequence numbers keep growing across restarts even if the clock was set back
+    if last_seq is not None:
+        events.bus.seed(int(last_seq) + SEQ_HEADROOM)
+
+
+def _update_job(job_id: str, **fields):
+    fields["updated_at"] = _now()
+    for key in ("artifacts", "last_event"):
+        if key in fields and not isinstance(fields[key], str):
+            fields[key] = json.dumps(fields[key])
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    with _db() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["request"] = json.loads(job["request"])
+    job["artifacts"] = json.loads(job["artifacts"] or "{}")
+    job["last_event"] = json.loads(job["last_event"]) if job["last_event"] else None
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _db() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    with _db() as conn:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def get_loudness(source_key: str) -> Optional[Dict[str, float]]:
+    """The stored loudness measurement of a source, or None if it was never measured."""
+    with _db() as conn:
+        row = conn.execute("SELECT measurement FROM loudness WHERE source_key = ?", (source_key,)).fetchone()
+    return json.loads(row["measurement"]) if row else None
+
+
+def _store_loudness(source_key: str, measurement: Dict[str, float]):
+    with _db() as conn:
+        conn.execute("INSERT OR REPLACE INTO loudness (source_key, measurement, created_at) VALUES (?, ?, ?)",
+                     (source_key, json.dumps(measurement), _now()))
+
+
+# --- Events ---
+
+def _is_terminal(event: Dict[str, Any]) -> bool:
+    return event.get("step") in events.TERMINAL_STEPS
+
+
+def _publish(job_id: str, event: Dict[str, Any], **fields):
+    """
+    Publishes an event for a job on the event bus and persists it as the job's last event.
+    Extra `fields` (e.g. status) are persisted together with the event; plain progress
+    updates only every `PERSIST_INTERVAL` seconds, so the encoder loop doesn't wait on SQLite.
+    """
+    event = events.bus.publish(job_id, event)
+    runtime = _runtime(job_id)
+    now = time.monotonic()
+    if fields or _is_terminal(event) or now - runtime.persisted_at >= PERSIST_INTERVAL:
+        runtime.persisted_at = now
+        _update_job(job_id, last_event=events.ndjson_event(event), **fields)
+
+
+async def subscribe(job_id: str) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Yields the recent events of a job followed by live ones, in the NDJSON format, until
+    the job reaches a final state. Works for jobs that finished before the subscription.
+    """
+    with events.bus.listen(job_id) as (history, queue):
+        job = await asyncio.to_thread(get_job, job_id)
+        if job is None:
+            return
+        history = [events.ndjson_event(event) for event in history]
+        if not history:
+            # Nothing recorded in this process (e.g. after a restart): fall back to the persisted event,
+            # unless it is the final event of a run that has since been resumed
+            last_event = job["last_event"]
+            if last_event and (job["status"] in FINAL_STATES or not _is_terminal(last_event)):
+                history = [last_event]
+            if job["status"] in FINAL_STATES and not any(_is_terminal(e) for e in history):
+                return
+        for event in history:
+            yield event
+        if history and _is_terminal(history[-1]):
+            return
+        while True:
+            event = events.ndjson_event(await queue.get())
+            yield event
+            if _is_terminal(event):
+                return
+
+
+async def subscribe_many(job_ids: List[str]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Interleaves the events of several jobs (see `subscribe`) as they arrive, until all of them are final."""
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def forward(job_id: str):
+        try:
+            async for event in subscribe(job_id):
+                queue.put_nowait(event)
+        finally:
+            queue.put_nowait(done)
+
+    tasks = [asyncio.create_task(forward(job_id)) for job_id in job_ids]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is done:
+                remaining -= 1
+                continue
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# --- Job control ---
+
+def submit_job(request: Dict[str, Any]) -> str:
+    """Persists a new processing job and schedules it. Returns the job id."""
+    job_id = uuid.uuid4().hex[:12]
+    now = _now()
+    # Pin the compressor settings so a resumed job encodes exactly like the original
+    request = {**request, "settings": download.compressor_settings(request.get("settings"))}
+    if request.get("renditions") is None:
+        request["renditions"] = CONFIG.get("renditions", [])
+    with _db() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, request, status, stage, artifacts, created_at, updated_at) VALUES (?, ?, 'queued', NULL, '{}', ?, ?)",
+            (job_id, json.dumps(request), now, now)
+        )
+    logging.info(f"Job {job_id} queued: {request}")
+    _publish(job_id, {"step": "download", "status": "queued", "progress": "00", "message": "In Warteschlange..."})
+    _get_executor().submit(_run_job, job_id)
+    return job_id
+
+
+def cancel_job(job_id: str) -> bool:
+    """Requests cancellation of a queued or running job."""
+    job = get_job(job_id)
+    if job is None or job["status"] not in ACTIVE_STATES:
+        return False
+    _runtime(job_id).cancel.set()
+    logging.info(f"Cancellation requested for job {job_id}")
+    return True
+
+
+def cleanup_work_dirs() -> int:
+    """
+    Deletes work dirs no resumable job needs anymore (left behind by crashes) and stale
+    partial files in the caches. Failed jobs keep theirs for `work_retention_days` so they can
+    still be resumed. Must run before jobs are scheduled.
+    """
+    init_db()
+    cutoff = (dt.datetime.now() - dt.timedelta(days=float(CONFIG.get("work_retention_days", 7)))).isoformat()
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) OR (status = 'failed' AND updated_at >= ?)",
+            (*ACTIVE_STATES, cutoff)
+        ).fetchall()
+    keep = {row["id"] for row in rows}
+    removed = 0
+    for work_root in (WORK_DIR, LEGACY_WORK_DIR):
+        if not work_root.exists():
+            continue
+        for path in work_root.iterdir():
+            if path.name in keep:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            removed += 1
+    # Nothing writes these while no job runs; what is left was interrupted
+    for path in list(cache.CACHE_DIR.rglob("*.part")) + list(PROCESSED_DIR.glob("*.part")):
+        path.unlink(missing_ok=True)
+        removed += 1
+    if removed:
+        logging.info(f"Removed {removed} orphaned work dir(s) and partial file(s)")
+    return removed
+
+
+def resume_jobs() -> int:
+    """Re-schedules jobs that were queued or running when the backend stopped."""
+    init_db()
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_STATES
+        ).fetchall()
+    for row in rows:
+        logging.info(f"Resuming job {row['id']}")
+        _update_job(row["id"], status="queued")
+        _get_executor().submit(_run_job, row["id"])
+    return len(rows)
+
+
+def resume_job(job_id: str) -> bool:
+    """Re-schedules a failed or cancelled job from its last completed stage."""
+    job = get_job(job_id)
+    if job is None or job["status"] not in ("failed", "cancelled"):
+        return False
+    _runtime(job_id).cancel.clear()
+    events.bus.clear(job_id)
+    _update_job(job_id, status="queued", error=None)
+    _get_executor().submit(_run_job, job_id)
+    return True
+
+
+# --- Pipeline ---
+
+def _metadata(request: Dict[str, Any]) -> Dict[str, str]:
+    datum = dt.date.fromisoformat(request["datum"])
+    return {
+        "title": request["titel"],
+        "speaker": request["prediger"],
+        "date": datum.strftime("%Y-%m-%d"),
+        "year": datum.strftime("%Y"),
+        "album": download.CONFIG.get("album_name", "Predigten aus Treffpunkt Leben Karlsruhe"),
+        "copyright": download.CONFIG.get("copyright_notice", "Treffpunkt Leben Karlsruhe - alle Rechte vorbehalten"),
+        "genre": "Predigt Online"
+    }
+
+
+def _final_name(request: Dict[str, Any], profile: Optional[Dict[str, Any]] = None) -> str:
+    datum = dt.date.fromisoformat(request["datum"])
+    name = f"predigt-{datum.strftime('%Y-%m-%d')}_Treffpunkt_Leben_Karlsruhe"
+    if profile is None:
+        return f"{name}.mp3"
+    return f"{name}_{profile.get('name') or profile['bitrate']}{download.rendition_extension(profile)}"
+
+
+def _bytes_per_second(bitrate: str) -> float:
+    """Bytes per second of audio at an ffmpeg bitrate such as "128k"."""
+    bitrate = str(bitrate).lower()
+    factor = 1000 if bitrate.endswith("k") else 1
+    return float(bitrate.rstrip("k")) * factor / 8
+
+
+def _check_free_space(request: Dict[str, Any]):
+    """
+    Fails early if the volume can't hold the job's files: the download, the MP3 and the
+    renditions, plus `min_free_mb` that is always left free.
+    """
+    needed = int(CONFIG.get("min_free_mb", 500)) * 1024 * 1024
+    start, end = request.get("start"), request.get("end")
+    duration = request["length"] / 1000 if request.get("length") else None
+    if end is not None:
+        duration = end - (start or 0)
+    elif duration and start:
+        duration -= start
+    if duration:
+        # Native YouTube audio stays below ~160 kbit/s; a quarter on top for peaks and partial files
+        rate = 20_000 + _bytes_per_second((request.get("settings") or {}).get("bitrate", "128k"))
+        rate += sum(_bytes_per_second(profile["bitrate"]) for profile in request.get("renditions") or [])
+        needed += int(duration * rate * 1.25)
+    PROCESSED_DIR.mkdir(exist_ok=True)
+    free = shutil.disk_usage(PROCESSED_DIR).free
+    if free < needed:
+        raise OSError(f"Nicht genug freier Speicherplatz: {free // 2**20} MB frei, {needed // 2**20} MB benötigt")
+
+
+def _finalize_file(source: str, target: Path) -> str:
+    """
+    Moves a finished file from the work area to its final place. Both are on the same volume,
+    so this is an atomic rename and a half-written file never shows up under the final name.
+    """
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Only if processed_files was moved while a job ran: copy next to the target, then rename
+        logging.warning(f"{source} is on another volume than {target}, copying")
+        tmp_path = target.with_name(target.name + ".part")
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+        os.remove(source)
+    return str(target)
+
+
+def _completed_stages(job: Dict[str, Any]) -> List[str]:
+    """Stages that are done and whose artifacts still exist on disk."""
+    if not job["stage"]:
+        return []
+    done = STAGES[:STAGES.index(job["stage"]) + 1]
+    artifacts = job["artifacts"]
+    # Finalizing moves the encoded files into processed_files, so they prove the earlier stages
+    # as well; a job that failed while publishing resumes right at the upload
+    finals = [artifacts.get("final_path")] + artifacts.get("rendition_final_paths", [])
+    if job["stage"] == "finalize" and all(path and os.path.exists(path) for path in finals):
+        return done
+    # A download is moot once the compressed audio exists (e.g. restored from the cache)
+    required = {
+        "download": ("downloaded_path", "compressed_path"),
+        "compress": ("compressed_path",),
+        "tags": ("compressed_path",),
+        "finalize": ("final_path",),
+    }
+    for i, stage in enumerate(done):
+        if not any(artifacts.get(key) and os.path.exists(artifacts[key]) for key in required[stage]):
+            return done[:i]
+    return done
+
+
+@contextmanager
+def _slot(semaphore: threading.BoundedSemaphore, job_id: str, runtime: _JobRuntime, waiting_event: Dict[str, Any]):
+    """Holds a download or encode slot; while none is free the job reports that it waits, and stays cancellable."""
+    if not semaphore.acquire(blocking=False):
+        _publish(job_id, waiting_event)
+        while not semaphore.acquire(timeout=0.5):
+            if runtime.cancel.is_set():
+                raise JobCancelled()
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+def _run_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        return
+    runtime = _runtime(job_id)
+    request = job["request"]
+    artifacts = dict(job["artifacts"])
+    work_dir = WORK_DIR / job_id
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    def check_cancelled():
+        if runtime.cancel.is_set():
+            raise JobCancelled()
+
+    def stage_done(stage: str):
+        _update_job(job_id, stage=stage, artifacts=artifacts)
+
+    slots = ExitStack()
+    # Keeps the source audio from being evicted from the cache while this job still needs it
+    leases = ExitStack()
+    try:
+        check_cancelled()
+        done = _completed_stages(job)
+        _update_job(job_id, status="running", stage=done[-1] if done else None)
+        if "finalize" not in done:
+            _check_free_space(request)
+        video_url = f"https://www.youtube.com/watch?v={request['id']}"
+        settings = request.get("settings") or download.compressor_settings()
+        start, end = request.get("start"), request.get("end")
+        publish = request.get("publish", False)
+        renditions = request.get("renditions") or []
+        # The segment joining relies on libmp3lame's frame layout and LAME tag
+        parallel = bool(CONFIG.get("parallel_encode", False)) and get_toolkit().encoder_for("mp3") == "libmp3lame"
+        key = cache.cache_key(request["id"], {**settings, "single_pass": request.get("single_pass", True),
+                                              "parallel_encode": parallel}, start, end)
+        compressed_path = work_dir / "compressed.mp3"
+        rendition_paths = [str(work_dir / f"rendition_{i}{download.rendition_extension(profile)}")
+                           for i, profile in enumerate(renditions)]
+
+        # Same video and compressor settings processed before: only the tags need to be redone.
+        # The cache only holds the main MP3, so jobs with renditions always encode.
+        if "compress" not in done and not renditions and cache.restore(key, str(compressed_path)):
+            artifacts["compressed_path"] = str(compressed_path)
+            stage_done("compress")
+            done = STAGES[:STAGES.index("compress") + 1]
+            _publish(job_id, {"step": "compress", "status": "completed", "progress": "75", "message": "Aus dem Cache übernommen."})
+
+        # 1. Download
+        if "download" not in done:
+            source = cache.lookup_source(request["id"], start, end, lease=True)
+            if source:
+                # Downloaded before (e.g. re-rendering with other settings): no need to fetch it again
+                artifacts["downloaded_path"], exact = source
+                leases.callback(cache.release_source, artifacts["downloaded_path"])
+                if exact and (start is not None or end is not None):
+                    artifacts["downloaded_section"] = [start, end]
+                message = "Quelle aus dem Cache übernommen."
+            else:
+                _publish(job_id, {"step": "download", "status": "in_progress", "progress": "05", "message": "Starte Download..."})
+
+                def on_download_progress(d):
+                    check_cancelled()
+
+                with _slot(_download_slots, job_id, runtime, {
+                        "step": "download", "status": "queued", "progress": "05",
+                        "message": "Wartet auf einen freien Download-Platz..."}):
+                    downloaded_path = download.download_youtube(
+                        video_url, str(work_dir), not request.get("single_pass", True), on_download_progress, start, end
+                    )
+                artifacts["downloaded_path"] = cache.store_source(request["id"], start, end, downloaded_path, lease=True)
+                leases.callback(cache.release_source, artifacts["downloaded_path"])
+                if start is not None or end is not None:
+                    artifacts["downloaded_section"] = [start, end]
+                message = "Download abgeschlossen."
+            stage_done("download")
+            _publish(job_id, {"step": "download", "status": "completed", "progress": "15", "message": message})
+
+        # 2. Compress
+        if "compress" not in done:
+            if "download" in done:
+                # Resumed after the download: the source has no lease from this run yet
+                cache.lease_source(artifacts["downloaded_path"])
+                leases.callback(cache.release_source, artifacts["downloaded_path"])
+            # Measuring and encoding are the CPU-heavy part; the slot is released once the encoder is done
+            slots.enter_context(_slot(_encode_slots, job_id, runtime, {
+                "step": "compress", "status": "queued", "progress": "15",
+                "message": "Wartet auf einen freien Encoder-Platz..."}))
+            duration = request["length"] / 1000 if request.get("length") else None
+            trim_start = trim_end = None
+            if artifacts.get("downloaded_section"):
+                # The download already is the requested section
+                if duration or end is not None:
+                    duration = (end if end is not None else duration) - (start or 0)
+            else:
+                trim_start, trim_end = start, end
+
+            # Loudness normalization: measure once per source, then a plain gain in front of the compressor
+            gain_db = None
+            progress_base, progress_span = 15, 0.6
+            if settings.get("loudness_target") is not None:
+                source_key = cache.source_key(request["id"], start, end)
+                measurement = get_loudness(source_key)
+                if measurement is None:
+                    for update in download.measure_loudness(artifacts["downloaded_path"], duration, trim_start, trim_end):
+                        check_cancelled()
+                        if "measurement" in update:
+                            # Reported together with the gain below; "completed" would end the compress step early
+                            measurement = update["measurement"]
+                            continue
+                        update['step'] = 'compress'
+                        # Measuring covers 15-25% of the overall progress, compression the rest up to 75%
+                        update['progress'] = f"{15 + update['percent'] * 0.1:.0f}"
+                        _publish(job_id, update)
+                    _store_loudness(source_key, measurement)
+                    progress_base, progress_span = 25, 0.5
+                gain_db = download.normalization_gain(measurement, settings)
+                if gain_db is None:
+                    _publish(job_id, {"step": "compress", "status": "in_progress", "progress": f"{progress_base}",
+                                      "warning": True,
+                                      "message": "Lautheit nicht messbar (Stille?), keine Anpassung"})
+                else:
+                    _publish(job_id, {"step": "compress", "status": "in_progress", "progress": f"{progress_base}",
+                                      "message": f"Lautheit {measurement['input_i']:.1f} LUFS, Anpassung {gain_db:+.1f} dB"})
+            uploader = local_file = sink = None
+            if publish:
+                # Tee the encoder output: local file and FTP STOR at the same time, tags in front
+                uploader = server_interact.start_streaming_upload(
+                    _final_name(request), int(CONFIG.get("publish_buffer_chunks", 64))
+                )
+                if uploader is None:
+                    _publish(job_id, {"step": "compress", "status": "in_progress", "progress": f"{progress_base}",
+                                      "message": "Alle Upload-Verbindungen belegt, wird nach dem Encodieren hochgeladen."})
+            if uploader:
+                local_file = open(compressed_path, 'wb')
+
+                def sink(chunk):
+                    local_file.write(chunk)
+                    uploader.put(chunk)
+
+                duration_ms = int(duration * 1000) if duration else None
+                sink(download.build_id3_header(_metadata(request), duration_ms))
+            peak_builder = None
+            if sink is None and not renditions and parallel:
+                updates = parallel_encode.compress_audio_parallel(
+                    artifacts["downloaded_path"], str(compressed_path), duration, settings, trim_start, trim_end,
+                    gain_db=gain_db
+                )
+            else:
+                # Waveform peaks come from the encoder's own output, unless its stdout carries the MP3
+                peak_builder = peaks.PeakBuilder() if sink is None else None
+                updates = download.compress_audio(
+                    artifacts["downloaded_path"], str(compressed_path), duration, settings, trim_start, trim_end, sink,
+                    list(zip(rendition_paths, renditions)), gain_db,
+                    peak_builder.feed if peak_builder else None, peaks.SAMPLE_RATE
+                )
+            try:
+                for update in updates:
+                    check_cancelled()
+                    update['step'] = 'compress'
+                    # Compression covers 15-75% of the overall progress
+                    update['progress'] = f"{progress_base + update.get('percent', 0) * progress_span:.0f}"
+                    _publish(job_id, update)
+            except BaseException:
+                if uploader:
+                    uploader.abort()
+                raise
+            finally:
+                updates.close()
+                if local_file:
+                    local_file.close()
+            # The encoder is done; a streamed upload still finishing doesn't need the slot
+            slots.close()
+            artifacts["compressed_path"] = str(compressed_path)
+            artifacts["rendition_paths"] = rendition_paths
+            if peak_builder:
+                peaks_file = work_dir / "compressed.peaks"
+                peaks.write(peaks_file, peak_builder.levels())
+                artifacts["peaks_path"] = str(peaks_file)
+            if uploader:
+                artifacts["streamed"] = True
+                upload_error = uploader.finish()
+                artifacts["uploaded"] = upload_error is None
+                if upload_error:
+                    _publish(job_id, {"step": "compress", "status": "in_progress", "progress": "75",
+                                      "message": f"Direkter Upload fehlgeschlagen, wird nachgeholt: {upload_error}"})
+            # Streamed files are pre-tagged and lack the Xing header, so they can't seed the cache
+            if not artifacts.get("streamed"):
+                cache.store(key, str(compressed_path))
+            stage_done("compress")
+            leases.close()
+
+        # 3. Tag
+        check_cancelled()
+        if "tags" not in done:
+            # Streamed files already carry their tags in front of the audio
+            if not artifacts.get("streamed"):
+                for update in download.generate_id3_tags(artifacts["compressed_path"], _metadata(request)):
+                    update['step'] = 'tags'
+                    update['progress'] = "80"
+                    _publish(job_id, update)
+            for path in artifacts.get("rendition_paths", []):
+                download.tag_rendition(path, _metadata(request))
+            stage_done("tags")
+
+        # 4. Rename and move to the persistent location so it still exists for /server/upload
+        check_cancelled()
+        if "finalize" not in done:
+            final_name = _final_name(request)
+            _publish(job_id, {"step": "finalize", "status": "in_progress", "progress": "90", "message": f"Renaming file to {final_name}..."})
+            PROCESSED_DIR.mkdir(exist_ok=True)
+            persistent_final_path = PROCESSED_DIR / final_name
+            artifacts["final_path"] = _finalize_file(artifacts["compressed_path"], persistent_final_path)
+            final_peaks = peaks.peaks_path(str(persistent_final_path))
+            try:
+                if artifacts.get("peaks_path") and os.path.exists(artifacts["peaks_path"]):
+                    _finalize_file(artifacts["peaks_path"], final_peaks)
+                else:
+                    # Restored from the cache, encoded in parallel or streamed: decode the result once
+                    peaks.compute_from_file(str(persistent_final_path), final_peaks)
+            except Exception as e:
+                # The waveform is a nicety; don't fail the sermon over it
+                logging.warning(f"Could not store waveform peaks for job {job_id}: {e}")
+            artifacts["rendition_final_paths"] = []
+            for path, profile in zip(artifacts.get("rendition_paths", []), renditions):
+                rendition_final_path = PROCESSED_DIR / _final_name(request, profile)
+                artifacts["rendition_final_paths"].append(_finalize_file(path, rendition_final_path))
+            stage_done("finalize")
+
+        # 5. Publish: upload the file if the streaming upload didn't finish it
+        if publish:
+            if not artifacts.get("uploaded"):
+                for update in server_interact.upload_file(artifacts["final_path"]):
+                    check_cancelled()
+                    _publish(job_id, {"step": "finalize", "status": "in_progress",
+                                      "progress": f"{90 + update['percent'] * 0.09:.0f}",
+                                      "message": f"Lade hoch... {update['percent']:.0f}%"})
+                artifacts["uploaded"] = True
+                _update_job(job_id, artifacts=artifacts)
+            # Renditions go up after the main file; upload_file skips files that are already complete
+            for path in artifacts.get("rendition_final_paths", []):
+                _publish(job_id, {"step": "finalize", "status": "in_progress", "progress": "99",
+                                  "message": f"Lade {os.path.basename(path)} hoch..."})
+                for _ in server_interact.upload_file(path):
+                    check_cancelled()
+            server_interact.send_update_request()
+
+        shutil.rmtree(work_dir, ignore_errors=True)
+        _publish(job_id, {
+            "step": "complete",
+            "status": "completed",
+            "progress": "100",
+            "message": "Verarbeitung abgeschlossen!",
+            "final_path": artifacts["final_path"],
+            "renditions": artifacts.get("rendition_final_paths", []),
+            "uploaded": bool(artifacts.get("uploaded"))
+        }, status="completed")
+    except Exception as e:
+        # yt-dlp wraps exceptions raised from progress hooks, so check the flag itself
+        if isinstance(e, JobCancelled) or runtime.cancel.is_set():
+            logging.info(f"Job {job_id} cancelled")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            _publish(job_id, {"step": "error", "status": "cancelled", "message": "Verarbeitung abgebrochen."},
+                     status="cancelled", stage=None, artifacts={})
+        else:
+            logging.error(f"Error in job {job_id}: {e}", exc_info=True)
+            _publish(job_id, {"step": "error", "status": "failed", "message": f"Ein Fehler ist aufgetreten: {e}"},
+                     status="failed", error=str(e))
+    finally:
+        slots.close()
+        leases.close()
@@ -0,0 +1,97 @@
+import sys
+import asyncio
+import time
+import logging
+import importlib
+import threading
+from typing import Dict, Any, Iterable, Optional
+
+# Seconds each lazily loaded module took to import, in load order
+IMPORT_TIMES: Dict[str, float] = {}
+_lock = threading.Lock()
+_warm_up = {"state": "pending", "seconds": None}
+
+
+class LazyModule:
+    """
+    Stands in for a module that is only imported on first attribute access, so the
+    server can answer requests before the heavy dependencies (YouTube client, yt-dlp,
+    ffmpeg, mutagen, bs4, numpy) are loaded. Attribute writes go to the real module.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = load(self._name)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+async def resolve(*modules: LazyModule):
+    """
+    Imports lazy modules in a worker thread. Call it before touching their attributes in
+    async code, so the first request that needs a module doesn't stall the event loop.
+    """
+    for module in modules:
+        if module._module is None:
+            await asyncio.to_thread(module._load)
+
+
+def load(name: str):
+    """Imports `name` and records how long it took, unless another module imported it already."""
+    if name in sys.modules:
+        # Still go through the import system: it waits if another thread is mid-import
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        IMPORT_TIMES.setdefault(name, round(elapsed, 3))
+    return module
+
+
+def warm_up(names: Iterable[str]):
+    """Imports the modules one after another, e.g. in a background thread after startup."""
+    _warm_up["state"] = "running"
+    start = time.perf_counter()
+    for name in names:
+        try:
+            load(name)
+        except Exception as e:
+            logging.warning(f"Warm-up import of {name} failed: {e}")
+    _warm_up["seconds"] = round(time.perf_counter() - start, 3)
+    _warm_up["state"] = "done"
+    logging.info(f"Warm-up finished in {_warm_up['seconds']}s: {IMPORT_TIMES}")
+
+
+def startup_report(ready_after: Optional[float] = None) -> Dict[str, Any]:
+    """How long the process took until it accepted requests, and what was imported since."""
+    with _lock:
+        imports = dict(IMPORT_TIMES)
+    return {
+        "ready_after_s": ready_after,
+        "warm_up": dict(_warm_up),
+        "imports": imports,
+    }
+
+
+def skip_warm_up():
+    _warm_up["state"] = "disabled"
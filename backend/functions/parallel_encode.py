@@ -0,0 +1,308 @@
+import os
+import math
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, Dict, Any, List, Optional, Tuple
+
+import ffmpeg
+
+from main import load_config
+from functions import download
+from utils.setup_ffmpeg import get_toolkit
+
+CONFIG = load_config()
+
+# MPEG-1 Layer III: every frame holds 1152 samples per channel.
+FRAME_SAMPLES = 1152
+# libmp3lame's encoder delay as ffmpeg records it in the LAME tag; with the 529 samples of
+# decoder delay, frame j of an encode covers input samples [j*1152 - 1105, (j+1)*1152 - 1105).
+ENCODER_DELAY = 576
+SEGMENT_SECONDS = 60
+# Extra frames encoded after a segment so its last kept frames don't see the encoder flush
+POSTROLL_FRAMES = 2
+BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+SAMPLE_RATES = [44100, 48000, 32000]
+
+
+def _workers() -> int:
+    return max(1, int(CONFIG.get("encode_workers") or os.cpu_count() or 1))
+
+
+def _preroll_seconds(settings: Dict[str, Any]) -> float:
+    """Audio fed to the compressor before a segment so its envelope has settled by the cut."""
+    return max(2.0, 5 * (float(settings["attack"]) + float(settings["release"])) / 1000)
+
+
+def _read_wav_header(stream) -> Tuple[int, int]:
+    """Reads a streamed WAV header up to the data chunk and returns (sample rate, channels)."""
+    header = stream.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise ValueError("Decoder did not produce a WAV stream")
+    sample_rate = channels = None
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise ValueError("WAV stream ended before the audio data")
+        size = int.from_bytes(chunk[4:8], 'little')
+        if chunk[:4] == b'data':
+            break
+        body = stream.read(size + size % 2)
+        if chunk[:4] == b'fmt ':
+            channels = int.from_bytes(body[2:4], 'little')
+            sample_rate = int.from_bytes(body[4:8], 'little')
+    if not sample_rate or not channels:
+        raise ValueError("WAV stream has no format chunk")
+    return sample_rate, channels
+
+
+def _split_frames(data: bytes) -> List[bytes]:
+    """Splits a raw MPEG-1 Layer III stream (no ID3/Xing) into its frames."""
+    frames = []
+    pos = 0
+    while pos + 4 <= len(data):
+        header = data[pos:pos + 4]
+        if header[0] != 0xFF or header[1] & 0xFE != 0xFA:
+            raise ValueError(f"No MPEG-1 Layer III frame at byte {pos}")
+        bitrate = BITRATES[header[2] >> 4] * 1000
+        sample_rate = SAMPLE_RATES[(header[2] >> 2) & 0x03]
+        length = 144 * bitrate // sample_rate + ((header[2] >> 1) & 0x01)
+        frames.append(data[pos:pos + length])
+        pos += length
+    return frames
+
+
+def _crc16(data: bytes, crc: int = 0) -> int:
+    """CRC-16/ARC, the checksum of the LAME tag."""
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def _patch_lame_tag(path: str, padding: int):
+    """
+    Writes encoder delay and padding into the LAME tag of `path`. ffmpeg writes the tag
+    when it muxes the joined frames but can't know either value from copied frames;
+    players need them to trim the first and last frame exactly like in a serial encode.
+    """
+    with open(path, 'r+b') as f:
+        head = f.read(64 * 1024)
+        start = 0
+        if head[:3] == b'ID3':
+            start = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9])
+        for tag in (b'Info', b'Xing'):
+            offset = head.find(tag, start, start + 64)
+            if offset >= 0:
+                break
+        else:
+            raise ValueError(f"No LAME tag found in {path}")
+        # delay and padding are 12 bits each, 141 bytes into the tag; the tag CRC covers
+        # the first 190 bytes of the frame and sits right behind them
+        delay_padding = ((ENCODER_DELAY << 12) | min(max(padding, 0), 0xFFF)).to_bytes(3, 'big')
+        frame = bytearray(head[start:start + 190])
+        frame[offset - start + 141:offset - start + 144] = delay_padding
+        f.seek(offset + 141)
+        f.write(delay_padding)
+        f.seek(start + 190)
+        f.write(_crc16(frame).to_bytes(2, 'big'))
+
+
+def _encode_segment(ffmpeg_executable: str, pcm: bytes, sample_rate: int, channels: int,
+                    settings: Dict[str, Any], gain_db: Optional[float] = None) -> bytes:
+    """Compresses and encodes one chunk of float PCM to raw MP3 frames."""
+    out, _ = (
+        ffmpeg
+        .input('pipe:', format='f32le', ar=sample_rate, ac=channels)
+        # No bit reservoir: every frame must decode on its own so segments can be joined
+        .output('pipe:', format='mp3', acodec='libmp3lame', audio_bitrate=settings["bitrate"],
+                af=download.compressor_filter(settings, gain_db), reservoir=0, write_xing=0, id3v2_version=0)
+        .global_args('-nostats', '-loglevel', 'error')
+        .run(cmd=ffmpeg_executable, input=pcm, capture_stdout=True, capture_stderr=True)
+    )
+    return out
+
+
+def compress_audio_parallel(file_path: str, output_path: str, duration: Optional[float] = None,
+                            settings: Optional[Dict[str, Any]] = None,
+                            start: Optional[float] = None, end: Optional[float] = None,
+                            workers: Optional[int] = None,
+                            gain_db: Optional[float] = None) -> Generator[Dict[str, Any], None, None]:
+    """
+    Like `download.compress_audio`, but encodes on several cores.
+
+    The input is decoded once to float PCM and cut into segments on MP3 frame boundaries.
+    Each segment is compressed and encoded by its own ffmpeg process, starting a few
+    seconds early so the compressor's attack/release state matches the serial run at the
+    cut; the frames of that pre-roll are dropped. Because segments start on multiples of
+    1152 samples, frame j of a segment is frame j of the serial encode, so the joined
+    stream has the same frame count, encoder delay and padding (hence the same length
+    and timing) as `compress_audio`. Frames are encoded without bit reservoir.
+    Yields the same progress updates as `compress_audio`.
+    """
+    yield {
+        "step": "Compressing",
+        "status": "in_progress",
+        "percent": 0.0,
+        "message": "Applying audio compression..."
+    }
+    ffmpeg_executable = get_toolkit().ffmpeg
+    if not duration:
+        duration = download.get_audio_duration(file_path)
+    settings = settings or download.compressor_settings()
+    workers = workers or _workers()
+
+    input_args = {}
+    if start:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    if duration and (start or end is not None):
+        duration = min(end if end is not None else duration, duration) - (start or 0)
+
+    decoder = (
+        ffmpeg
+        .input(file_path, **input_args)
+        .output('pipe:', format='wav', acodec='pcm_f32le', vn=None)
+        .global_args('-nostats', '-loglevel', 'error')
+        .run_async(cmd=ffmpeg_executable, pipe_stdout=True, pipe_stderr=True)
+    )
+    muxer = None
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode")
+    try:
+        try:
+            sample_rate, channels = _read_wav_header(decoder.stdout)
+        except ValueError:
+            # Most likely the decoder failed; its own error says more
+            if decoder.wait() != 0:
+                raise ffmpeg.Error('ffmpeg', None, decoder.stderr.read())
+            raise
+        if sample_rate not in SAMPLE_RATES:
+            raise ValueError(f"Parallel encoding needs 32/44.1/48 kHz audio, got {sample_rate} Hz")
+        # The muxer writes ID3 and the Xing/LAME header around the copied frames, like a serial encode
+        muxer = (
+            ffmpeg
+            .input('pipe:', format='mp3')
+            .output(output_path, acodec='copy')
+            .global_args('-nostats', '-loglevel', 'error')
+            .overwrite_output()
+            .run_async(cmd=ffmpeg_executable, pipe_stdin=True, pipe_stderr=True)
+        )
+
+        frame_bytes = FRAME_SAMPLES * channels * 4
+        segment_frames = max(1, round(SEGMENT_SECONDS * sample_rate / FRAME_SAMPLES))
+        preroll_frames = math.ceil(_preroll_seconds(settings) * sample_rate / FRAME_SAMPLES)
+
+        buffer = bytearray()
+        buffer_start = 0  # first MP3 frame slot held in `buffer`
+        eof = False
+        total_samples = 0
+        written_frames = 0
+        pending: deque = deque()
+        started = time.time()
+
+        def collect():
+            """Writes the oldest finished segment to the muxer."""
+            nonlocal written_frames
+            future, skip, keep = pending.popleft()
+            frames = _split_frames(future.result())
+            frames = frames[skip:] if keep is None else frames[skip:skip + keep]
+            if keep is not None and len(frames) < keep:
+                raise ValueError(f"Segment encode returned {len(frames)} frames, expected {keep}")
+            muxer.stdin.write(b''.join(frames))
+            written_frames += len(frames)
+
+        def progress() -> Dict[str, Any]:
+            encoded = min(written_frames * FRAME_SAMPLES / sample_rate, duration)
+            elapsed = time.time() - started
+            speed = encoded / elapsed if elapsed > 0 else None
+            percent = min(encoded / duration * 100, 100.0)
+            eta = (duration - encoded) / speed if speed else None
+            message = f"Compressing... {percent:.0f}%"
+            if eta is not None:
+                message += f" (ETA {download._format_eta(eta)})"
+            return {
+                "step": "Compressing",
+                "status": "in_progress",
+                "percent": round(percent, 1),
+                "eta": round(eta, 1) if eta is not None else None,
+                "speed": round(speed, 1) if speed else None,
+                "message": message
+            }
+
+        first_frame = 0
+        while True:
+            skip = min(preroll_frames, first_frame)
+            needed_end = first_frame + segment_frames + POSTROLL_FRAMES
+            while not eof and buffer_start + len(buffer) // frame_bytes < needed_end:
+                data = decoder.stdout.read(frame_bytes * segment_frames)
+                if not data:
+                    eof = True
+                    break
+                buffer += data
+                total_samples += len(data) // (channels * 4)
+            # The last segment runs to the end of the input and keeps all its frames, flush included
+            last = eof and buffer_start + len(buffer) / frame_bytes <= needed_end
+            begin = (first_frame - skip - buffer_start) * frame_bytes
+            pcm = bytes(buffer[begin:]) if last else bytes(buffer[begin:(needed_end - buffer_start) * frame_bytes])
+            future = executor.submit(_encode_segment, ffmpeg_executable, pcm, sample_rate, channels, settings, gain_db)
+            pending.append((future, skip, None if last else segment_frames))
+            if last:
+                break
+            # Drop what no later segment needs (the next pre-roll starts before the next segment)
+            first_frame += segment_frames
+            keep_from = max(first_frame - preroll_frames, 0)
+            del buffer[:(keep_from - buffer_start) * frame_bytes]
+            buffer_start = keep_from
+            # Bound memory: at most one queued segment per worker beyond the running ones
+            while len(pending) > workers:
+                collect()
+                if duration:
+                    yield progress()
+        while pending:
+            collect()
+            if duration:
+                yield progress()
+
+        decoder.wait()
+        if decoder.returncode != 0:
+            raise ffmpeg.Error('ffmpeg', None, decoder.stderr.read())
+        muxer.stdin.close()
+        mux_errors = muxer.stderr.read()
+        if muxer.wait() != 0:
+            raise ffmpeg.Error('ffmpeg', None, mux_errors)
+        _patch_lame_tag(output_path, written_frames * FRAME_SAMPLES - total_samples - ENCODER_DELAY)
+        logging.info(f"Encoded {total_samples / sample_rate:.0f}s on {workers} workers "
+                     f"in {time.time() - started:.1f}s")
+    except ffmpeg.Error as e:
+        error_msg = e.stderr.decode() if e.stderr else str(e)
+        logging.error(f"FFmpeg Error: {error_msg}")
+        yield {
+            "step": "Compressing",
+            "status": "failed",
+            "message": f"FFmpeg error: {error_msg}"
+        }
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error in parallel audio compression: {e}")
+        yield {
+            "step": "Compressing",
+            "status": "failed",
+            "message": f"Compression error: {e}"
+        }
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in (decoder, muxer):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+
+    yield {
+        "step": "Compressing",
+        "status": "completed",
+        "percent": 100.0,
+        "message": "Audio compression successful."
+    }
@@ -0,0 +1,157 @@
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import ffmpeg
+import numpy as np
+
+from main import load_config
+from utils.setup_ffmpeg import get_toolkit
+
+CONFIG = load_config()
+
+# Peaks are taken from a low-rate mono stream, like the analysis; plenty for a waveform.
+SAMPLE_RATE = 8000
+# Level 0 holds one min/max pair per 10 ms; every further level halves the resolution.
+BASE_BLOCK = 80
+# The coarsest level has at most this many pairs (a full-width overview).
+MIN_LEVEL_SIZE = 512
+
+MAGIC = b'PEAK'
+# magic, version, bits per value, levels, sample rate, samples per pair on level 0
+HEADER = struct.Struct('<4sBBHII')
+VERSION = 1
+
+
+def peaks_path(audio_path: str) -> Path:
+    """Where the peaks of a processed file are stored: next to it, with a .peaks suffix."""
+    return Path(audio_path).with_suffix('.peaks')
+
+
+class PeakBuilder:
+    """
+    Builds min/max peaks from s16le mono PCM at `SAMPLE_RATE` that arrives in chunks
+    (e.g. straight from the encoder), then downsamples them into a pyramid of levels.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._mins: List[np.ndarray] = []
+        self._maxs: List[np.ndarray] = []
+
+    def feed(self, chunk: bytes):
+        data = self._pending + chunk
+        block_bytes = BASE_BLOCK * 2
+        usable = len(data) - len(data) % block_bytes
+        if usable:
+            blocks = np.frombuffer(data[:usable], dtype='<i2').reshape(-1, BASE_BLOCK)
+            self._mins.append(blocks.min(axis=1))
+            self._maxs.append(blocks.max(axis=1))
+        self._pending = data[usable:]
+
+    def levels(self) -> List[np.ndarray]:
+        """The peak levels, finest first; each is an (n, 2) int16 array of min/max pairs."""
+        mins = list(self._mins)
+        maxs = list(self._maxs)
+        if self._pending:
+            tail = np.frombuffer(self._pending[:len(self._pending) - len(self._pending) % 2], dtype='<i2')
+            if len(tail):
+                mins.append(tail.min(keepdims=True))
+                maxs.append(tail.max(keepdims=True))
+        level = np.stack([
+            np.concatenate(mins) if mins else np.zeros(0, dtype=np.int16),
+            np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.int16),
+        ], axis=1)
+        levels = [level]
+        while len(level) > MIN_LEVEL_SIZE:
+            if len(level) % 2:
+                level = np.concatenate([level, level[-1:]])
+            pairs = level.reshape(-1, 2, 2)
+            level = np.stack([pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)], axis=1)
+            levels.append(level)
+        return levels
+
+
+def write(path: Path, levels: List[np.ndarray], bits: Optional[int] = None):
+    """
+    Stores the levels as one binary file: a header, the pair count of every level, then
+    the levels one after another as interleaved min/max values (int8 or int16).
+    """
+    bits = bits or int(CONFIG.get("peaks_bits", 8))
+    tmp_path = path.with_suffix('.peaks.part')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, bits, len(levels), SAMPLE_RATE, BASE_BLOCK))
+        f.write(struct.pack(f'<{len(levels)}I', *(len(level) for level in levels)))
+        for level in levels:
+            values = (level >> 8).astype(np.int8) if bits == 8 else level.astype('<i2')
+            f.write(values.tobytes())
+    tmp_path.replace(path)
+
+
+def _read_header(f) -> Dict[str, Any]:
+    magic, version, bits, level_count, sample_rate, base_block = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a peaks file")
+    counts = struct.unpack(f'<{level_count}I', f.read(4 * level_count))
+    return {"bits": bits, "sample_rate": sample_rate, "base_block": base_block, "counts": list(counts)}
+
+
+def info(path: Path) -> Dict[str, Any]:
+    """Describes the levels of a peaks file: pairs per level and pairs per second."""
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+    return {
+        "bits": header["bits"],
+        "levels": [
+            {"level": i, "count": count,
+             "per_second": header["sample_rate"] / (header["base_block"] << i)}
+            for i, count in enumerate(header["counts"])
+        ],
+    }
+
+
+def read_range(path: Path, level: int, start: int = 0, count: Optional[int] = None) -> tuple:
+    """
+    Reads `count` min/max pairs from `start` on one level, seeking straight to them.
+    Returns the raw interleaved bytes and the header.
+    """
+    with open(path, 'rb') as f:
+        header = _read_header(f)
+        counts = header["counts"]
+        if not 0 <= level < len(counts):
+            raise ValueError(f"Level {level} does not exist, the file has {len(counts)} levels")
+        start = max(0, min(start, counts[level]))
+        end = counts[level] if count is None else min(counts[level], start + max(0, count))
+        pair_bytes = 2 * header["bits"] // 8
+        data_start = HEADER.size + 4 * len(counts)
+        f.seek(data_start + sum(counts[:level]) * pair_bytes + start * pair_bytes)
+        return f.read((end - start) * pair_bytes), {**header, "start": start, "total": counts[level]}
+
+
+def compute_from_file(audio_path: str, path: Optional[Path] = None) -> Path:
+    """Decodes `audio_path` and stores its peaks; for outputs whose PCM wasn't available while encoding."""
+    ffmpeg_executable = get_toolkit().ffmpeg
+    process = (
+        ffmpeg
+        .input(audio_path)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE, vn=None)
+        .global_args('-nostats', '-loglevel', 'error')
+        .run_async(cmd=ffmpeg_executable, pipe_stdout=True, pipe_stderr=True)
+    )
+    builder = PeakBuilder()
+    try:
+        for chunk in iter(lambda: process.stdout.read(SAMPLE_RATE * 2 * 60), b''):
+            builder.feed(chunk)
+        stderr = process.stderr.read()
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+    path = path or peaks_path(audio_path)
+    write(path, builder.levels())
+    logging.info(f"Peaks of {audio_path} written to {path}")
+    return path
@@ -1,83 +1,533 @@
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import time
 import ftplib
+import hashlib
+import json
+import queue
 import re
+import threading
 import requests
 import logging
+from contextlib import contextmanager
 from bs4 import BeautifulSoup 
 
 from main import load_config 
 
 CONFIG = load_config()
 
-def send_file_to_server(path):
-    file_name = os.path.basename(path)
 
-    server = CONFIG.get('server')
-    name = CONFIG.get('name')
-    password = CONFIG.get('password')
+class FTPPool:
+    """
+    Keeps logged-in FTP sessions around so operations don't pay a TCP+login handshake each time.
+    Idle sessions get a NOOP keepalive, are health-checked before reuse and closed after `idle_timeout`.
+    """
 
-    session = ftplib.FTP(server, name, password)
-    file = open(path, 'rb')
-    session.storbinary(f'STOR {file_name}', file)     
-    file.close()
-    session.quit()
+    def __init__(self, max_size: int = 4, idle_timeout: float = 120, keepalive: float = 30,
+                 acquire_timeout: float = 30):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # (session, generation, last_used)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._maintainer = None
 
-def check_if_file_on_server(path):
-    file_name = os.path.basename(path)
+    def _connect(self):
+        session = ftplib.FTP(CONFIG.get('server'), CONFIG.get('name'), CONFIG.get('password'), timeout=30)
+        logging.info("Opened new FTP session")
+        return session
 
-    server = CONFIG.get('server')
-    name = CONFIG.get('name')
-    password = CONFIG.get('password')
-    try:
-        session = ftplib.FTP(server, name, password)
-        files_on_server = session.nlst()
-        
-        if file_name in files_on_server:
+    @staticmethod
+    def _close(session):
+        try:
             session.quit()
+        except ftplib.all_errors:
+            session.close()
+
+    @staticmethod
+    def _is_alive(session) -> bool:
+        try:
+            session.voidcmd('NOOP')
             return True
-        else:
-            session.quit()
+        except ftplib.all_errors:
             return False
-        
-    except ftplib.all_errors as e:
-        logging.error(f"Error: {e}")
-        return False
-    
-def list_files_on_server():
-    """List all files on the FTP server."""
-    server = CONFIG.get('server')
-    name = CONFIG.get('name')
-    password = CONFIG.get('password')
+
+    def _take(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    generation = self._generation
+                    break
+                session, generation, last_used = self._idle.pop()
+                current = self._generation
+            idle_for = time.monotonic() - last_used
+            if generation != current or idle_for > self.idle_timeout:
+                self._close(session)
+            elif idle_for < self.keepalive or self._is_alive(session):
+                return session, generation
+            else:
+                session.close()
+        # The caller's slot is reserved already; connecting outside the lock keeps a slow
+        # server from blocking releases, invalidation and keepalives of everyone else
+        return self._connect(), generation
+
+    @contextmanager
+    def session(self):
+        """
+        Borrows a session from the pool; broken sessions are discarded instead of returned.
+        Raises ftplib.error_temp if no session frees up within `acquire_timeout` seconds.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise ftplib.error_temp(f"No FTP session free within {self.acquire_timeout:.0f}s")
+        try:
+            session, generation = self._take()
+            try:
+                yield session
+            except (GeneratorExit,) + ftplib.all_errors:
+                # Broken connection or a transfer abandoned halfway: don't reuse it
+                session.close()
+                raise
+            except BaseException:
+                self._release(session, generation)
+                raise
+            else:
+                self._release(session, generation)
+        finally:
+            self._slots.release()
+
+    def _release(self, session, generation):
+        with self._lock:
+            if generation == self._generation:
+                self._idle.append((session, generation, time.monotonic()))
+                self._start_maintainer()
+                return
+        self._close(session)
+
+    def _start_maintainer(self):
+        if self._maintainer is None or not self._maintainer.is_alive():
+            self._maintainer = threading.Thread(target=self._maintain, daemon=True, name="ftp-pool")
+            self._maintainer.start()
+
+    def _maintain(self):
+        """Sends keepalives to idle sessions and closes expired ones; exits once the pool is empty."""
+        while True:
+            time.sleep(self.keepalive)
+            with self._lock:
+                idle, self._idle = self._idle, []
+                current = self._generation
+            keep = []
+            for session, generation, last_used in idle:
+                if generation != current or time.monotonic() - last_used > self.idle_timeout:
+                    self._close(session)
+                elif self._is_alive(session):
+                    keep.append((session, generation, last_used))
+                else:
+                    session.close()
+            with self._lock:
+                self._idle.extend(keep)
+                if not self._idle:
+                    self._maintainer = None
+                    return
+
+    def invalidate(self):
+        """Closes all idle sessions; sessions in use are closed when they are returned."""
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for session, _, _ in idle:
+            self._close(session)
+        logging.info("FTP session pool invalidated")
+
+
+_pool = FTPPool(
+    max_size=int(CONFIG.get('ftp_pool_size', 4)),
+    idle_timeout=float(CONFIG.get('ftp_idle_timeout', 120)),
+    keepalive=float(CONFIG.get('ftp_keepalive', 30)),
+    acquire_timeout=float(CONFIG.get('ftp_acquire_timeout', 30)),
+)
+
+
+def config_changed():
+    """Applies new pool and index timings after the configuration was reloaded; the pool size stays until a restart."""
+    _pool.idle_timeout = float(CONFIG.get('ftp_idle_timeout', 120))
+    _pool.keepalive = float(CONFIG.get('ftp_keepalive', 30))
+    _pool.acquire_timeout = float(CONFIG.get('ftp_acquire_timeout', 30))
+    _index.ttl = float(CONFIG.get('ftp_index_ttl', 300))
+
+
+DATE_REGEXES = [
+    re.compile(r'^predigt-(\d{4}-\d{2}-\d{2})_'),          # predigt-YYYY-MM-DD_
+    re.compile(r'^(\d{4}-\d{2}-\d{2})\s*-'),               # YYYY-MM-DD - 
+]
+
+def extract_date_from_filename(filename):
+    for rx in DATE_REGEXES:
+        m = rx.search(filename)
+        if m:
+            try:
+                return datetime.strptime(m.group(1), '%Y-%m-%d')
+            except ValueError:
+                pass
+    return datetime(1900, 1, 1)
+
+
+class RemoteIndex:
+    """
+    In-memory index of the remote directory (name -> size/mtime), built from MLSD and
+    kept sorted by the date in the file name. Entries older than `ttl` seconds are re-listed.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._files = {}
+        self._sorted = []
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _list_remote(self):
+        with _pool.session() as session:
+            try:
+                return {
+                    name: {
+                        "size": int(facts["size"]) if "size" in facts else None,
+                        "modified": facts.get("modify"),
+                    }
+                    for name, facts in session.mlsd(facts=["type", "size", "modify"])
+                    if facts.get("type", "file") == "file"
+                }
+            except ftplib.error_perm:
+                # Server without MLSD support
+                return {name: {"size": None, "modified": None} for name in session.nlst()}
+
+    def _resort(self):
+        self._sorted = sorted(
+            (f for f in self._files if f not in ['.', '..', '.empty']),
+            key=lambda name: self._files[name]["date"],
+            reverse=True
+        )
+
+    def refresh(self):
+        files = self._list_remote()
+        for name, entry in files.items():
+            entry["date"] = extract_date_from_filename(name)
+        with self._lock:
+            self._files = files
+            self._fetched_at = time.monotonic()
+            self._resort()
+
+    def _ensure_fresh(self):
+        with self._lock:
+            fresh = self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+        if not fresh:
+            self.refresh()
+
+    def exists(self, names):
+        """Returns {name: bool} for all `names`, listing the server at most once."""
+        self._ensure_fresh()
+        with self._lock:
+            return {name: name in self._files for name in names}
+
+    def latest(self, limit: int = 15):
+        self._ensure_fresh()
+        with self._lock:
+            return self._sorted[:limit]
+
+    def get(self, name):
+        self._ensure_fresh()
+        with self._lock:
+            return self._files.get(name)
+
+    def add(self, name, size=None):
+        """Records a file that was just uploaded, without re-listing the server."""
+        with self._lock:
+            if self._fetched_at is None:
+                return
+            self._files[name] = {
+                "size": size,
+                "modified": datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S'),
+                "date": extract_date_from_filename(name),
+            }
+            self._resort()
+
+    def invalidate(self):
+        with self._lock:
+            self._files = {}
+            self._sorted = []
+            self._fetched_at = None
+
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+# What this backend uploaded under each remote name, so a re-upload is only skipped for identical content
+UPLOAD_RECORD_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ftp_uploads.json")
+_upload_record_lock = threading.Lock()
+
+_index = RemoteIndex(ttl=float(CONFIG.get('ftp_index_ttl', 300)))
+
+
+def invalidate_pool():
+    """Drops all pooled FTP sessions and the remote index, e.g. after the FTP credentials changed."""
+    _pool.invalidate()
+    _index.invalidate()
+
+
+def _remote_size(session, file_name):
     try:
-        session = ftplib.FTP(server, name, password)
-        files = session.nlst()
-        session.quit()
+        session.voidcmd('TYPE I')
+        return session.size(file_name)
+    except ftplib.error_perm:
+        return None  # Not on the server (or SIZE unsupported)
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(UPLOAD_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-        actual_files = [f for f in files if f not in ['.', '..', '.empty']]
+def _uploaded_digest(file_name, size):
+    """sha256 this backend last uploaded as `file_name` with the given size, if any."""
+    with _upload_record_lock:
+        try:
+            with open(UPLOAD_RECORD_PATH) as f:
+                entry = json.load(f).get(file_name)
+        except (OSError, ValueError):
+            return None
+    if entry and entry.get("size") == size:
+        return entry.get("sha256")
+    return None
 
-        date_regexes = [
-            re.compile(r'^predigt-(\d{4}-\d{2}-\d{2})_'),          # predigt-YYYY-MM-DD_
-            re.compile(r'^(\d{4}-\d{2}-\d{2})\s*-'),               # YYYY-MM-DD - 
-        ]
+def _record_upload(file_name, digest, size):
+    with _upload_record_lock:
+        try:
+            with open(UPLOAD_RECORD_PATH) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = {}
+        record[file_name] = {"sha256": digest, "size": size}
+        tmp_path = f"{UPLOAD_RECORD_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, UPLOAD_RECORD_PATH)
 
-        def extract_date_from_filename(filename):
-            for rx in date_regexes:
-                m = rx.search(filename)
-                if m:
+def _publish_remote(session, temp_name, file_name, expected_size):
+    """Verifies the size of an uploaded temp file and renames it to its public name."""
+    remote_size = _remote_size(session, temp_name)
+    if remote_size is not None and remote_size != expected_size:
+        raise ftplib.error_reply(f"Size mismatch after upload: remote {remote_size}, expected {expected_size}")
+    try:
+        session.rename(temp_name, file_name)
+    except ftplib.error_perm:
+        # Some servers refuse to rename over an existing file
+        session.delete(file_name)
+        session.rename(temp_name, file_name)
+
+def _upload_attempt(path, file_name, local_size, digest):
+    """
+    One upload attempt. The data goes to a temp name derived from the file's content, so only a
+    partial upload of exactly this file is resumed; it is renamed to `file_name` once complete.
+    """
+    temp_name = f"{file_name}.{digest[:12]}.part"
+    with _pool.session() as session:
+        if _uploaded_digest(file_name, local_size) == digest and _remote_size(session, file_name) == local_size:
+            yield {"status": "skipped", "bytes_sent": local_size}
+            return
+        remote_size = _remote_size(session, temp_name)
+        offset = remote_size if remote_size and remote_size <= local_size else 0
+
+        sent = offset
+        if offset < local_size:
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                if offset:
+                    logging.info(f"Resuming upload of {file_name} at byte {offset}")
                     try:
-                        return datetime.strptime(m.group(1), '%Y-%m-%d')
-                    except ValueError:
-                        pass
-            return datetime(1900, 1, 1)
-
-        sorted_files = sorted(
-            actual_files,
-            key=extract_date_from_filename,
-            reverse=True
-        )[:15]
+                        conn = session.transfercmd(f'STOR {temp_name}', rest=offset)
+                    except ftplib.error_perm:
+                        # No REST support for STOR, append instead
+                        conn = session.transfercmd(f'APPE {temp_name}')
+                else:
+                    conn = session.transfercmd(f'STOR {temp_name}')
+
+                last_report = 0.0
+                with conn:
+                    while True:
+                        block = file.read(UPLOAD_BLOCK_SIZE)
+                        if not block:
+                            break
+                        conn.sendall(block)
+                        sent += len(block)
+                        if time.monotonic() - last_report >= 0.25:
+                            last_report = time.monotonic()
+                            yield {"status": "in_progress", "bytes_sent": sent}
+                session.voidresp()
+
+        try:
+            _publish_remote(session, temp_name, file_name, local_size)
+        except ftplib.error_reply:
+            # A bad partial must not be resumed again
+            session.delete(temp_name)
+            raise
+    _record_upload(file_name, digest, local_size)
+    yield {"status": "completed", "bytes_sent": sent}
+
+def upload_file(path):
+    """
+    Uploads a file through a content-named temp file, resuming a partial upload of the same
+    content with REST/APPE, verifying the final size and renaming it into place.
+    Yields progress dicts (status, bytes_sent, total_bytes, percent). A file this backend already
+    uploaded with the same content is skipped. Failed attempts are retried from where they stopped.
+    """
+    file_name = os.path.basename(path)
+    local_size = os.path.getsize(path)
+    digest = _file_digest(path)
+    retries = int(CONFIG.get('ftp_upload_retries', 3))
+
+    for attempt in range(1, retries + 1):
+        try:
+            for update in _upload_attempt(path, file_name, local_size, digest):
+                update["total_bytes"] = local_size
+                update["percent"] = round(update["bytes_sent"] / local_size * 100, 1) if local_size else 100.0
+                if update["status"] in ("completed", "skipped"):
+                    _index.add(file_name, local_size)
+                yield update
+            return
+        except ftplib.all_errors as e:
+            if attempt == retries:
+                raise
+            logging.warning(f"Upload of {file_name} failed (attempt {attempt}/{retries}): {e}, retrying")
+            time.sleep(2 * attempt)
+
+def _delete_remote(file_name):
+    try:
+        with _pool.session() as session:
+            session.delete(file_name)
+    except ftplib.all_errors as e:
+        logging.warning(f"Could not delete remote file {file_name}: {e}")
+
+def upload_stream(file_name, chunks):
+    """
+    Uploads the data of an iterable of byte chunks with a single STOR. Returns the bytes sent.
+    The data goes to a temporary name that is only renamed to `file_name` once its size is
+    verified, so a failed or aborted stream never shows up under the public name.
+    """
+    temp_name = f"{file_name}.part"
+    digest = hashlib.sha256()
+    try:
+        with _pool.session() as session:
+            session.voidcmd('TYPE I')
+            sent = 0
+            with session.transfercmd(f'STOR {temp_name}') as conn:
+                for chunk in chunks:
+                    conn.sendall(chunk)
+                    digest.update(chunk)
+                    sent += len(chunk)
+            session.voidresp()
+            _publish_remote(session, temp_name, file_name, sent)
+    except BaseException:
+        _delete_remote(temp_name)
+        raise
+    _record_upload(file_name, digest.hexdigest(), sent)
+    _index.add(file_name, sent)
+    return sent
+
+class StreamingUpload:
+    """
+    Uploads data while it is still being produced: `put()` chunks into a bounded buffer that a
+    background thread streams into the STOR. If the upload fails, further chunks are dropped so
+    the producer is never blocked; `finish()` then reports the error.
+    """
 
-        return sorted_files
+    def __init__(self, file_name, buffer_chunks: int = 64, on_finished=None):
+        self.file_name = file_name
+        self.error = None
+        self._on_finished = on_finished
+        self._queue = queue.Queue(maxsize=buffer_chunks)
+        self._done = object()
+        self._abort = object()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"upload-{file_name}")
+        self._thread.start()
+
+    def _chunks(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is self._done:
+                return
+            if chunk is self._abort:
+                raise ftplib.error_temp("Upload aborted")
+            yield chunk
+
+    def _run(self):
+        try:
+            upload_stream(self.file_name, self._chunks())
+        except Exception as e:
+            logging.error(f"Streaming upload of {self.file_name} failed: {e}")
+            self.error = e
+        finally:
+            if self._on_finished:
+                self._on_finished()
+
+    def _offer(self, item):
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def put(self, chunk: bytes):
+        self._offer(chunk)
+
+    def finish(self):
+        """Waits for the upload to complete; returns the exception if it failed, else None."""
+        self._offer(self._done)
+        self._thread.join()
+        return self.error
+
+    def abort(self):
+        """Stops the upload and removes the partial remote file."""
+        self._offer(self._abort)
+        self._thread.join()
+
+def _streaming_allowance() -> int:
+    """Streaming uploads hold a pooled session for a whole encode; at least one is left for everything else."""
+    configured = CONFIG.get('ftp_streaming_uploads')
+    allowance = int(configured) if configured is not None else max(1, _pool.max_size // 2)
+    return max(0, min(allowance, _pool.max_size - 1))
+
+_streaming_slots = threading.BoundedSemaphore(_streaming_allowance())
+
+def start_streaming_upload(file_name, buffer_chunks: int = 64):
+    """
+    Starts a StreamingUpload of `file_name` if a streaming slot is free. Returns None when all
+    are taken; the file should then be uploaded once it is finished.
+    """
+    if not _streaming_slots.acquire(blocking=False):
+        return None
+    return StreamingUpload(file_name, buffer_chunks, on_finished=_streaming_slots.release)
+
+def send_file_to_server(path):
+    for _ in upload_file(path):
+        pass
+
+def check_if_file_on_server(path):
+    return check_files_on_server([path]).get(os.path.basename(path), False)
+
+def check_files_on_server(paths):
+    """Checks existence of many files at once; returns {file name: bool}."""
+    names = [os.path.basename(path) for path in paths]
+    try:
+        return _index.exists(names)
+    except ftplib.all_errors as e:
+        logging.error(f"Error: {e}")
+        return {name: False for name in names}
+    
+def list_files_on_server():
+    """List the 15 newest files on the FTP server."""
+    try:
+        return _index.latest(15)
     except ftplib.all_errors as e:
         logging.error(f"Error listing files on server: {e}")
         return []
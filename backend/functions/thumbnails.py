@@ -0,0 +1,122 @@
+import io
+import os
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+import requests
+from PIL import Image
+
+from main import load_config
+
+CONFIG = load_config()
+
+BACKEND_DIR = Path(__file__).parent.parent
+THUMBNAIL_DIR = BACKEND_DIR / "thumbnails"
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbnail")
+_sources: Dict[str, str] = {}  # cache file name -> remote thumbnail URL
+_lock = threading.Lock()
+
+
+def _card_width() -> int:
+    return int(CONFIG.get("thumbnail_width", 480))
+
+
+def _max_age() -> float:
+    return float(CONFIG.get("thumbnail_max_age", 86400))
+
+
+def _cache_name(source_url: str) -> str:
+    """
+    File name derived from the source URL and target size. YouTube keeps the URL when a
+    thumbnail is replaced, so the cached file is refetched once it is older than `_max_age()`.
+    """
+    return hashlib.sha256(f"{source_url}|{_card_width()}".encode()).hexdigest()[:24] + ".jpg"
+
+
+def register(livestreams: Iterable[Dict[str, Any]]) -> list:
+    """
+    Remembers the remote thumbnail of each livestream so the proxy endpoint can serve it,
+    and returns the livestreams with a `thumbnail` path pointing at that endpoint.
+    """
+    registered = []
+    with _lock:
+        for livestream in livestreams:
+            livestream = dict(livestream)
+            if livestream.get("url"):
+                name = _cache_name(livestream["url"])
+                _sources[name] = livestream["url"]
+                livestream["thumbnail"] = f"/youtube/thumbnails/{name}"
+            registered.append(livestream)
+    return registered
+
+
+def _is_fresh(path: Path) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime < _max_age()
+    except FileNotFoundError:
+        return False
+
+
+def _fetch(source_url: str, path: Path):
+    response = requests.get(source_url, timeout=15)
+    response.raise_for_status()
+    image = Image.open(io.BytesIO(response.content)).convert("RGB")
+    width = _card_width()
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+    THUMBNAIL_DIR.mkdir(exist_ok=True)
+    tmp_path = path.with_suffix(f".{threading.get_ident()}.part")
+    image.save(tmp_path, "JPEG", quality=85, optimize=True)
+    os.replace(tmp_path, path)
+    logging.info(f"Cached thumbnail {path.name}")
+
+
+def cached_path(name: str) -> Optional[Path]:
+    """
+    The on-disk thumbnail `name`, downloading and downscaling it on first use and
+    refetching it once it is stale. A stale copy is served if the refetch fails.
+    """
+    path = THUMBNAIL_DIR / Path(name).name
+    if _is_fresh(path):
+        return path
+    with _lock:
+        source_url = _sources.get(path.name)
+    if source_url is None:
+        return path if path.exists() else None
+
+    try:
+        _fetch(source_url, path)
+    except Exception:
+        if not path.exists():
+            raise
+        logging.warning(f"Could not refresh thumbnail {path.name}, serving the cached copy", exc_info=True)
+    return path
+
+
+def etag(path: Path) -> str:
+    """Strong ETag of a cached thumbnail, derived from its bytes."""
+    return '"' + hashlib.sha256(path.read_bytes()).hexdigest()[:16] + '"'
+
+
+def _prefetch_one(name: str):
+    try:
+        cached_path(name)
+    except Exception as e:
+        logging.warning(f"Could not prefetch thumbnail {name}: {e}")
+
+
+def prefetch(livestreams: Iterable[Dict[str, Any]]) -> list:
+    """Registers the livestreams (see `register`) and caches their thumbnails in the background."""
+    livestreams = register(livestreams)
+    for livestream in livestreams:
+        name = Path(livestream.get("thumbnail", "")).name
+        if name and not _is_fresh(THUMBNAIL_DIR / name):
+            _executor.submit(_prefetch_one, name)
+    return livestreams
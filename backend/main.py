@@ -1,21 +1,41 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import json
+import sys
+import threading
 import datetime as dt
-import tempfile
 import pathlib
-from typing import Dict, Any, AsyncGenerator
+from typing import Dict, Any, AsyncGenerator, Optional, List, Literal
 import logging
 import os
-import shutil  # <-- add
 from logging.handlers import RotatingFileHandler
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel
 
+_WEB_IMPORT_TIME = time.perf_counter() - _IMPORT_STARTED
+# Both can be moved elsewhere through the environment, e.g. so test runs leave the tree alone
+CONFIG_PATH = pathlib.Path(os.getenv("BACKEND_CONFIG_PATH") or pathlib.Path(__file__).parent / "config.json")
+LOG_DIR = pathlib.Path(os.getenv("BACKEND_LOG_DIR") or pathlib.Path(__file__).parent / "log")
+_config_cache: Optional[Dict[str, Any]] = None
+
 
-def load_config() -> Dict[str, Any]:
+def load_config(reload: bool = False) -> Dict[str, Any]:
+    """
+    Returns a copy of the configuration. It is read from config.json and environment
+    variables once; pass `reload=True` after config.json changed.
+    """
+    global _config_cache
+    if _config_cache is None or reload:
+        _config_cache = _read_config()
+    return dict(_config_cache)
+
+
+def _read_config() -> Dict[str, Any]:
     """Loads the configuration from config.json and environment variables."""
     # Try to load .env file if it exists
     try:
@@ -26,7 +46,7 @@ def load_config() -> Dict[str, Any]:
     except ImportError:
         pass
     
-    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+    config_path = CONFIG_PATH
     
     # Default configuration if file doesn't exist
     default_config = {
@@ -74,10 +94,43 @@ def load_config() -> Dict[str, Any]:
     return config
 
 
-from functions import download
-from functions import server_interact
+from functions import lazy
 
 
+def reload_config():
+    """
+    Re-reads the configuration and hands a copy to every function module that is loaded
+    already (modules loaded later read it on import), then lets each module apply settings
+    it derived from it via an optional `config_changed()`.
+    """
+    load_config(reload=True)
+    for name, module in list(sys.modules.items()):
+        if name.startswith("functions.") and isinstance(getattr(module, "CONFIG", None), dict):
+            module.CONFIG = load_config()
+            if hasattr(module, "config_changed"):
+                module.config_changed()
+
+# The function modules pull in the YouTube client, yt-dlp, ffmpeg, mutagen, bs4 and numpy;
+# they are imported on first use (or by the warm-up) so the server starts answering quickly.
+download = lazy.lazy_import("functions.download")
+server_interact = lazy.lazy_import("functions.server_interact")
+jobs = lazy.lazy_import("functions.jobs")
+analysis = lazy.lazy_import("functions.analysis")
+cache = lazy.lazy_import("functions.cache")
+thumbnails = lazy.lazy_import("functions.thumbnails")
+peaks = lazy.lazy_import("functions.peaks")
+events = lazy.lazy_import("functions.events")
+WARM_UP_MODULES = [
+    # The heavy third-party packages first, so the startup report shows what each of them costs
+    "yt_dlp", "googleapiclient.discovery", "numpy", "PIL.Image", "mutagen.mp3", "ffmpeg", "bs4",
+    "functions.download", "functions.jobs", "functions.server_interact",
+    "functions.analysis", "functions.thumbnails", "functions.peaks",
+]
+lazy.IMPORT_TIMES["fastapi"] = round(_WEB_IMPORT_TIME, 3)
+_ready_after: Optional[float] = None
+# Set once old work dirs are cleaned up and interrupted jobs are rescheduled; job endpoints wait for it
+_jobs_restored = threading.Event()
+
 
 app = FastAPI(title="Predigten Uploader API")
 
@@ -87,11 +140,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Peaks-Bits", "X-Peaks-Start", "X-Peaks-Total", "X-Peaks-Per-Second"],
 )
 
 # --- Logging Setup ---
-log_dir = pathlib.Path(__file__).parent / "log"
-log_dir.mkdir(exist_ok=True)
+log_dir = LOG_DIR
+log_dir.mkdir(parents=True, exist_ok=True)
 log_file = log_dir / "backend.log"
 # Create a rotating file handler (1MB per file, keep 5 backups)
 file_handler = RotatingFileHandler(log_file, maxBytes=1024*1024, backupCount=5)
@@ -107,6 +161,54 @@ logging.getLogger("uvicorn.error").addHandler(file_handler)
 # --- End Logging Setup ---
 
 
+def restore_jobs():
+    # Clear what crashed jobs left behind, then pick up jobs that were interrupted by a restart
+    jobs.cleanup_work_dirs()
+    resumed = jobs.resume_jobs()
+    if resumed:
+        logging.info(f"Resumed {resumed} unfinished job(s)")
+
+
+def background_startup(warm_up: bool):
+    try:
+        restore_jobs()
+    except Exception as e:
+        logging.error(f"Could not restore jobs: {e}", exc_info=True)
+    finally:
+        _jobs_restored.set()
+    if warm_up:
+        lazy.warm_up(WARM_UP_MODULES)
+        try:
+            # Resolve and probe ffmpeg once, before the first job needs it
+            from utils.setup_ffmpeg import get_toolkit
+            logging.info(f"FFmpeg: {get_toolkit().summary()}")
+        except Exception as e:
+            logging.warning(f"Could not set up FFmpeg: {e}")
+
+
+async def jobs_restored():
+    """
+    Waits until the startup thread has cleaned up and resumed the jobs (only matters right after
+    launch) and the job modules are imported.
+    """
+    if not _jobs_restored.is_set():
+        await asyncio.to_thread(_jobs_restored.wait)
+    await lazy.resolve(jobs, events)
+
+
+@app.on_event("startup")
+async def startup():
+    # Restoring jobs needs the heavy modules; do it in the background so the server
+    # accepts requests right away, then import the remaining modules ahead of first use
+    global _ready_after
+    _ready_after = round(time.perf_counter() - _IMPORT_STARTED, 3)
+    warm_up = str(load_config().get("warm_up", "True")).lower() != "false"
+    if not warm_up:
+        lazy.skip_warm_up()
+    threading.Thread(target=background_startup, args=(warm_up,), name="startup", daemon=True).start()
+    logging.info(f"Backend ready after {_ready_after}s")
+
+
 # --- Pydantic Models ---
 
 class PublicConfigModel(BaseModel):
@@ -141,28 +243,93 @@ class FullConfigUpdateModel(BaseModel):
 class LivestreamRequest(BaseModel):
     limit: int = 10
 
+class RenditionProfile(BaseModel):
+    codec: Literal["mp3", "opus", "aac"] = "mp3"
+    bitrate: str # e.g. "64k"
+    channels: Optional[int] = None # 1 = mono; default keeps the source channels
+    name: Optional[str] = None # Suffix of the file name, defaults to the bitrate
+
 class ProcessAudioRequest(BaseModel):
     id: str # Video ID
     prediger: str
     titel: str
     datum: dt.date
+    length: Optional[int] = None # Livestream length in ms, used for progress percentages
+    start: Optional[float] = None # Sermon start in seconds; only this section is downloaded and encoded
+    end: Optional[float] = None # Sermon end in seconds
+    single_pass: bool = True # Feed the native stream straight into the compress step; False = legacy MP3 round-trip
+    publish: bool = False # Upload to the FTP server while encoding instead of afterwards
+    renditions: Optional[List[RenditionProfile]] = None # Extra outputs next to the main MP3; default from the config
+
+class RerenderAudioRequest(ProcessAudioRequest):
+    # Compressor settings for this render; unset values fall back to the config
+    threshold_db: Optional[float] = None
+    ratio: Optional[float] = None
+    attack: Optional[float] = None
+    release: Optional[float] = None
+    bitrate: Optional[str] = None
+
+class PreviewAudioRequest(BaseModel):
+    id: str # Video ID
+    offset: float = 0 # Excerpt start in seconds of the video
+    length: float = 25 # Excerpt length in seconds, at most 30
+    start: Optional[float] = None # Section the video was processed with, to find the cached source
+    end: Optional[float] = None
+    threshold_db: Optional[float] = None
+    ratio: Optional[float] = None
+    attack: Optional[float] = None
+    release: Optional[float] = None
+    bitrate: Optional[str] = None
+
+class AnalyzeAudioRequest(BaseModel):
+    id: str # Video ID
+    start: Optional[float] = None # Restrict the analysis to a section (seconds)
+    end: Optional[float] = None
+
+class BatchProcessRequest(BaseModel):
+    requests: List[ProcessAudioRequest]
 
 class UploadFileRequest(BaseModel):
     file_path: str
 
+class CheckFilesRequest(BaseModel):
+    file_paths: List[str]
+
 async def run_sync_generator(gen):
-    """Runs a synchronous generator in a thread-safe way."""
-    for item in await asyncio.to_thread(list, gen):
+    """
+    Runs a synchronous generator in a worker thread and yields its items
+    as soon as they are produced, handed over through an asyncio.Queue.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for item in gen:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+    producer = loop.run_in_executor(None, produce)
+    while True:
+        item, error = await queue.get()
+        if item is done:
+            await producer
+            if error is not None:
+                raise error
+            break
         yield item
-        await asyncio.sleep(0.01) # Yield control to event loop
 
 
 
 # --- API Endpoints ---
 @app.get("/status")
 async def get_status():
-    """Check if the backend is properly configured and working."""
-    config = download.CONFIG
+    """Check if the backend is properly configured and working. Never waits for the heavy imports."""
+    config = load_config()
     status = {
         "backend_running": True,
         "config_loaded": bool(config),
@@ -175,12 +342,13 @@ async def get_status():
         status["channel_configured"],
         status["ftp_configured"]
     ])
+    status["startup"] = lazy.startup_report(_ready_after)
     return status
 
 @app.get("/config")
 async def get_config():
     """Gets the current non-sensitive configuration."""
-    config = download.CONFIG
+    config = load_config()
     # Return only non-sensitive configuration
     return {
         "threshold_db": config.get("threshold_db", -12),
@@ -195,7 +363,7 @@ async def get_config():
 async def update_config(config: ConfigUpdateModel):
     """Updates the non-sensitive configuration and saves it to config.json."""
     try:
-        config_path = pathlib.Path(__file__).parent / "config.json"
+        config_path = CONFIG_PATH
         
         # Load existing config
         with open(config_path, 'r') as f:
@@ -213,8 +381,7 @@ async def update_config(config: ConfigUpdateModel):
         with open(config_path, 'w') as f:
             json.dump(existing_config, f, indent=2)
         
-        # Reload the config in the functions module
-        download.CONFIG = download.load_config()
+        await asyncio.to_thread(reload_config)
         
         return {"status": "success", "message": "Configuration updated successfully"}
     except Exception as e:
@@ -225,7 +392,7 @@ async def update_config(config: ConfigUpdateModel):
 async def setup_full_config(config: FullConfigUpdateModel):
     """Complete configuration setup - writes the full config.json file."""
     try:
-        config_path = pathlib.Path(__file__).parent / "config.json"
+        config_path = CONFIG_PATH
         
         # Create the complete config.json structure
         full_config = {
@@ -248,8 +415,10 @@ async def setup_full_config(config: FullConfigUpdateModel):
         with open(config_path, 'w') as f:
             json.dump(full_config, f, indent=2)
         
-        # Reload the config in functions module
-        download.CONFIG = download.load_config()
+        # Pooled FTP sessions use the old credentials
+        await asyncio.to_thread(reload_config)
+        if "functions.server_interact" in sys.modules:
+            await asyncio.to_thread(sys.modules["functions.server_interact"].invalidate_pool)
         
         logging.info("✅ Complete configuration setup successful")
         return {"status": "success", "message": "Complete configuration setup successful"}
@@ -259,123 +428,332 @@ async def setup_full_config(config: FullConfigUpdateModel):
         return {"status": "error", "message": f"Configuration setup failed: {e}"}
 
 @app.get("/youtube/livestreams")
-async def get_livestreams(limit: int = 10):
-    """Gets the last livestreams from the configured YouTube channel."""
-    # Run the synchronous generator in a separate thread to avoid blocking
-    livestreams = await asyncio.to_thread(list, download.get_last_livestream_data(limit))
-    return livestreams
+async def get_livestreams(response: Response, limit: int = 10, cursor: Optional[str] = None):
+    """
+    Gets the last livestreams from the configured YouTube channel.
+    For older services pass the `X-Next-Cursor` response header back as `cursor`.
+    """
+    try:
+        await lazy.resolve(download, thumbnails)
+        livestreams, next_cursor = await asyncio.to_thread(download.get_livestreams_page, limit, cursor)
+    except Exception as e:
+        logging.error(f"Error fetching YouTube livestreams: {e}")
+        return []
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Serve thumbnails from the local cache; new ones are fetched in the background
+    return await asyncio.to_thread(thumbnails.prefetch, livestreams)
+
+@app.get("/youtube/thumbnails/{name}")
+async def get_thumbnail(name: str, request: Request):
+    """
+    Serves a downscaled livestream thumbnail from the disk cache. The cache refetches
+    thumbnails after a while, so clients revalidate with the ETag instead of keeping them forever.
+    """
+    try:
+        await lazy.resolve(thumbnails)
+        path = await asyncio.to_thread(thumbnails.cached_path, name)
+        tag = await asyncio.to_thread(thumbnails.etag, path) if path else None
+    except Exception as e:
+        logging.error(f"Error loading thumbnail {name}: {e}")
+        return Response(status_code=502)
+    if path is None:
+        return Response(status_code=404)
+    headers = {"Cache-Control": "public, max-age=3600", "ETag": tag}
+    if request.headers.get("if-none-match") == tag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
 
 @app.post("/audio/process")
 async def process_audio_stream(req: ProcessAudioRequest):
     """
     Processes an audio stream from a YouTube URL.
-    This endpoint streams progress updates for each step.
+    The work runs as a background job; this endpoint streams its progress updates
+    for each step. If the client disconnects the job keeps running and can be
+    followed again through /jobs/{job_id}/events.
     """
 
     logging.info(f"Received processing request: {req}")
     logging.info(f"Video ID: {req.id}, Prediger: {req.prediger}, Titel: {req.titel}, Datum: {req.datum}")
-    
-    video_url = f"https://www.youtube.com/watch?v={req.id}"
-    
-    async def processing_generator() -> AsyncGenerator[str, None]:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            try:
-                # 1. Download
-                yield json.dumps({"step": "download", "status": "in_progress", "progress": "05", "message": "Starte Download..."}) + "\n"
-                downloaded_path = await asyncio.to_thread(download.download_youtube, video_url, temp_dir)
-                yield json.dumps({"step": "download", "status": "completed", "progress": "15", "message": "Download abgeschlossen."}) + "\n"
-
-                # 2. Compress
-                compressed_path = pathlib.Path(temp_dir) / "compressed.mp3"
-                async for update in run_sync_generator(download.compress_audio(downloaded_path, str(compressed_path))):
-                    update['step'] = 'compress'
-                    update['progress'] = "60"
-                    yield json.dumps(update) + "\n"
-
-                # 3. Tag
-                metadata = {
-                    "title": req.titel,
-                    "speaker": req.prediger,
-                    "date": req.datum.strftime("%Y-%m-%d"),
-                    "year": req.datum.strftime("%Y"),
-                    "album": download.CONFIG.get("album_name", "Predigten aus Treffpunkt Leben Karlsruhe"),
-                    "copyright": download.CONFIG.get("copyright_notice", "Treffpunkt Leben Karlsruhe - alle Rechte vorbehalten"),
-                    "genre": "Predigt Online"
-                }
-                async for update in run_sync_generator(download.generate_id3_tags(str(compressed_path), metadata)):
-                    update['step'] = 'tags'
-                    update['progress'] = "80"
-                    yield json.dumps(update) + "\n"
-
-                # 4. Rename
-                final_name = f"predigt-{req.datum.strftime('%Y-%m-%d')}_Treffpunkt_Leben_Karlsruhe.mp3"
-                yield json.dumps({"step": "finalize", "status": "in_progress", "progress": "90", "message": f"Renaming file to {final_name}..."}) + "\n"
-                final_path = await asyncio.to_thread(download.rename_file, str(compressed_path), final_name)
-
-                # Move file to persistent location so it still exists for /server/upload
-                persistent_dir = pathlib.Path(__file__).parent / "processed_files"
-                persistent_dir.mkdir(exist_ok=True)
-                persistent_final_path = persistent_dir / final_name
-                await asyncio.to_thread(shutil.move, final_path, persistent_final_path)
-
-                yield json.dumps({
-                    "step": "complete",
-                    "status": "completed",
-                    "progress": "100",
-                    "message": "Verarbeitung abgeschlossen!",
-                    "final_path": str(persistent_final_path)  # return persistent path
-                }) + "\n"
-            except Exception as e:
-                logging.error(f"Error in processing stream: {e}", exc_info=True)
-                yield json.dumps({"step": "error", "status": "failed", "message": f"Ein Fehler ist aufgetreten: {e}"}) + "\n"
-    return StreamingResponse(processing_generator(), media_type="application/x-ndjson")
 
-@app.post("/server/upload")
-async def upload_file_to_server(req: UploadFileRequest):
-    """Upload a file to the FTP server with proper renaming."""
+    await jobs_restored()
+    job_id = await asyncio.to_thread(jobs.submit_job, req.model_dump(mode="json"))
+    return StreamingResponse(job_event_stream(job_id), media_type="application/x-ndjson")
+
+@app.post("/audio/process/batch")
+async def process_audio_batch(req: BatchProcessRequest):
+    """
+    Queues several processing jobs at once (e.g. after the holidays) and streams the progress
+    of all of them on one NDJSON stream; every event carries its job_id. Downloads and encodes
+    of different jobs overlap, limited by `max_concurrent_downloads` and `max_concurrent_encodes`.
+    """
+    logging.info(f"Received batch processing request for {len(req.requests)} video(s): {[r.id for r in req.requests]}")
+    await jobs_restored()
+    # A request that can't be queued is reported in the stream; the others still run
+    job_ids, rejected = [], []
+    for index, r in enumerate(req.requests):
+        try:
+            job_ids.append(await asyncio.to_thread(jobs.submit_job, r.model_dump(mode="json")))
+        except Exception as e:
+            logging.error(f"Error queueing batch request {index} ({r.id}): {e}")
+            rejected.append({"step": "error", "status": "failed", "progress": "0", "request_index": index,
+                             "video_id": r.id, "message": f"Auftrag konnte nicht eingereiht werden: {e}"})
+    total = len(req.requests)
+
+    async def batch_event_stream() -> AsyncGenerator[str, None]:
+        yield json.dumps({"step": "batch", "status": "queued", "progress": "0", "job_ids": job_ids,
+                          "message": f"{len(job_ids)} Aufträge eingereiht."}) + "\n"
+        for event in rejected:
+            yield json.dumps(event) + "\n"
+        results = {}
+        async for event in jobs.subscribe_many(job_ids):
+            if event["step"] in ("complete", "error"):
+                results[event["job_id"]] = event["status"]
+            yield json.dumps(event) + "\n"
+        completed = sum(1 for status in results.values() if status == "completed")
+        yield json.dumps({"step": "batch", "status": "completed", "progress": "100", "job_ids": job_ids,
+                          "completed": completed, "failed": total - completed,
+                          "message": f"{completed} von {total} Aufträgen abgeschlossen."}) + "\n"
+    return StreamingResponse(batch_event_stream(), media_type="application/x-ndjson")
+
+@app.post("/audio/rerender")
+async def rerender_audio_stream(req: RerenderAudioRequest):
+    """
+    Encodes a previously downloaded video again with other compressor settings.
+    Only the compress, tag and finalize steps run; the source audio comes from the
+    source cache. Streams the progress like /audio/process.
+    """
+    await lazy.resolve(cache)
+    if await asyncio.to_thread(cache.lookup_source, req.id, req.start, req.end) is None:
+        async def missing_source() -> AsyncGenerator[str, None]:
+            yield json.dumps({"step": "error", "status": "failed",
+                              "message": "Die Quelle ist nicht mehr im Cache, bitte neu verarbeiten."}) + "\n"
+        return StreamingResponse(missing_source(), media_type="application/x-ndjson")
+
+    request = req.model_dump(mode="json", include=set(ProcessAudioRequest.model_fields))
+    request["settings"] = req.model_dump(include={"threshold_db", "ratio", "attack", "release", "bitrate"})
+    logging.info(f"Received re-render request: {request}")
+    await jobs_restored()
+    job_id = await asyncio.to_thread(jobs.submit_job, request)
+    return StreamingResponse(job_event_stream(job_id), media_type="application/x-ndjson")
+
+@app.post("/audio/preview")
+async def preview_audio(req: PreviewAudioRequest):
+    """
+    Renders a short excerpt of a processed video with and without compression, for A/B
+    listening while tuning the compressor. Needs the source in the source cache.
+    Returns the URLs of both renders.
+    """
+    await lazy.resolve(cache, download)
+    source = await asyncio.to_thread(cache.lookup_source, req.id, req.start, req.end, True)
+    if source is None:
+        return {"status": "error", "message": "Die Quelle ist nicht mehr im Cache, bitte neu verarbeiten."}
+    source_path, exact = source
     try:
-        logging.info(f"Uploading file to server: {req.file_path}")
+        # A section source starts at the section start, not at the beginning of the video
+        offset = max(0.0, req.offset - (req.start or 0)) if exact else req.offset
+        settings = download.compressor_settings(
+            req.model_dump(include={"threshold_db", "ratio", "attack", "release", "bitrate"}))
+        # Normalize like the full render would, if this source has been measured already
+        gain_db = None
+        if settings["loudness_target"] is not None:
+            await jobs_restored()
+            measurement = await asyncio.to_thread(jobs.get_loudness, cache.source_key(req.id, req.start, req.end))
+            if measurement:
+                gain_db = download.normalization_gain(measurement, settings)
+        try:
+            paths = await asyncio.to_thread(
+                download.render_preview, source_path, offset, min(max(req.length, 1), 30), str(cache.PREVIEW_DIR),
+                settings, gain_db)
+            await asyncio.to_thread(cache.evict_previews)
+        except Exception as e:
+            logging.error(f"Error rendering preview for {req.id}: {e}")
+            return {"status": "error", "message": f"Preview failed: {e}"}
+        return {
+            "status": "success",
+            "settings": settings,
+            **{kind: f"/audio/preview/{pathlib.Path(path).name}" for kind, path in paths.items()},
+        }
+    finally:
+        cache.release_source(source_path)
+
+@app.get("/audio/preview/{name}")
+async def get_preview(name: str):
+    """Serves a rendered preview excerpt."""
+    await lazy.resolve(cache)
+    path = cache.PREVIEW_DIR / pathlib.Path(name).name
+    if not path.exists():
+        return Response(status_code=404)
+    return FileResponse(path, media_type="audio/mpeg")
+
+@app.get("/audio/peaks/{file_name}")
+async def get_peaks_info(file_name: str):
+    """Lists the waveform zoom levels of a processed file (pairs per level and per second)."""
+    await lazy.resolve(jobs, peaks)
+    path = peaks.peaks_path(str(jobs.PROCESSED_DIR / pathlib.Path(file_name).name))
+    if not path.exists():
+        return {"status": "error", "message": f"No waveform for {file_name}"}
+    return {"status": "success", **await asyncio.to_thread(peaks.info, path)}
+
+@app.get("/audio/peaks/{file_name}/{level}")
+async def get_peaks(file_name: str, level: int, start: int = 0, count: Optional[int] = None):
+    """
+    Returns `count` min/max pairs from `start` on one zoom level (0 = finest) as raw
+    interleaved int8/int16 values. The headers describe the slice.
+    """
+    await lazy.resolve(jobs, peaks)
+    path = peaks.peaks_path(str(jobs.PROCESSED_DIR / pathlib.Path(file_name).name))
+    if not path.exists():
+        return Response(status_code=404)
+    try:
+        data, header = await asyncio.to_thread(peaks.read_range, path, level, start, count)
+    except ValueError as e:
+        return Response(content=str(e), status_code=400)
+    return Response(content=data, media_type="application/octet-stream", headers={
+        "X-Peaks-Bits": str(header["bits"]),
+        "X-Peaks-Start": str(header["start"]),
+        "X-Peaks-Total": str(header["total"]),
+        "X-Peaks-Per-Second": str(header["sample_rate"] / (header["base_block"] << level)),
+    })
+
+async def job_event_stream(job_id: str) -> AsyncGenerator[str, None]:
+    await jobs_restored()
+    async for event in jobs.subscribe(job_id):
+        yield json.dumps(event) + "\n"
+
+@app.post("/audio/analyze")
+async def analyze_audio(req: AnalyzeAudioRequest):
+    """Proposes sermon start/end points from the energy and silence of the livestream audio."""
+    try:
+        await lazy.resolve(download, analysis)
+        video_url = f"https://www.youtube.com/watch?v={req.id}"
+        stream_url = await asyncio.to_thread(download.get_stream_url, video_url)
+        result = await asyncio.to_thread(analysis.analyze_audio, stream_url, req.start, req.end)
+        return {"status": "success", **result}
+    except Exception as e:
+        logging.error(f"Error analyzing audio: {e}", exc_info=True)
+        return {"status": "error", "message": f"Analysis failed: {e}"}
+
+@app.post("/jobs")
+async def create_job(req: ProcessAudioRequest):
+    """Queues a processing job and returns its id without waiting for it."""
+    await jobs_restored()
+    job_id = await asyncio.to_thread(jobs.submit_job, req.model_dump(mode="json"))
+    return {"status": "success", "job_id": job_id}
+
+@app.get("/jobs")
+async def get_jobs(limit: int = 50):
+    """Lists the most recent processing jobs."""
+    await jobs_restored()
+    return {"status": "success", "jobs": await asyncio.to_thread(jobs.list_jobs, limit)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns the persisted state of a single job."""
+    await jobs_restored()
+    job = await asyncio.to_thread(jobs.get_job, job_id)
+    if job is None:
+        return {"status": "error", "message": f"Job not found: {job_id}"}
+    return {"status": "success", "job": job}
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Re-subscribes to the progress stream of a job (recent events are replayed first)."""
+    return StreamingResponse(job_event_stream(job_id), media_type="application/x-ndjson")
+
+# Keeps proxies from caching or buffering event streams
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/events")
+async def get_events(request: Request, job_id: Optional[str] = None, last_event_id: Optional[int] = None):
+    """
+    Server-sent progress events of one job (`job_id`) or of all jobs. Every event has a
+    monotonic `seq` (also the SSE id) and a numeric `progress`. Reconnecting clients send
+    `Last-Event-ID` (EventSource does that itself) or `last_event_id` and get the events
+    they missed replayed first. A one-job stream ends after the job's final event.
+    """
+    header = request.headers.get("last-event-id", "")
+    after = int(header) if header.isdigit() else last_event_id
+    await jobs_restored()
+    if job_id is not None:
+        job = await asyncio.to_thread(jobs.get_job, job_id)
+        if job is None:
+            return Response(status_code=404)
+        if job["status"] in jobs.FINAL_STATES and not events.bus.history(job_id):
+            # Finished before a restart: the persisted last event is all that is left
+            async def finished_event() -> AsyncGenerator[str, None]:
+                last_event = job["last_event"] or {}
+                seq = last_event.get("seq") or events.bus.last_seq
+                yield events.format_sse(events.typed_event(job_id, last_event, seq))
+            return StreamingResponse(finished_event(), media_type="text/event-stream", headers=SSE_HEADERS)
+    return StreamingResponse(events.sse_stream(job_id, after), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancels a queued or running job."""
+    await jobs_restored()
+    if await asyncio.to_thread(jobs.cancel_job, job_id):
+        return {"status": "success", "message": "Cancellation requested"}
+    return {"status": "error", "message": f"Job {job_id} is not active"}
+
+@app.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str):
+    """Restarts a failed or cancelled job from its last completed stage."""
+    await jobs_restored()
+    if await asyncio.to_thread(jobs.resume_job, job_id):
+        return {"status": "success", "message": "Job resumed"}
+    return {"status": "error", "message": f"Job {job_id} cannot be resumed"}
+
+def prepare_upload_file(file_path: str):
+    """
+    Brings a local file into the final upload naming scheme.
+    Returns (path to upload, None) or (None, error message).
+    """
+    src_path = pathlib.Path(file_path)
 
-        src_path = pathlib.Path(req.file_path)
+    if not src_path.exists():
+        return None, f"File not found: {file_path}"
 
-        if not src_path.exists():
-            return {"status": "error", "message": f"File not found: {req.file_path}"}
+    original_filename = src_path.name
 
-        original_filename = src_path.name
+    def already_final(name: str) -> bool:
+        return name.startswith("predigt-") and name.endswith("_Treffpunkt_Leben_Karlsruhe.mp3")
 
-        def already_final(name: str) -> bool:
-            return name.startswith("predigt-") and name.endswith("_Treffpunkt_Leben_Karlsruhe.mp3")
+    if already_final(original_filename):
+        logging.info("File already in final upload naming scheme. Skipping rename.")
+        return src_path, None
 
-        if already_final(original_filename):
-            file_to_upload = src_path
-            logging.info("File already in final upload naming scheme. Skipping rename.")
-        else:
-            try:
-                date_part = original_filename.split(' - ')[0]
-                dt.datetime.strptime(date_part, '%Y-%m-%d')
-                datum = date_part
-            except (ValueError, IndexError):
-                return {
-                    "status": "error",
-                    "message": f"Could not extract valid date from filename: {original_filename}"
-                }
-
-            new_filename = f"predigt-{datum}_Treffpunkt_Leben_Karlsruhe.mp3"
-            new_file_path = src_path.parent / new_filename
-
-            if new_file_path.exists():
-                logging.warning(f"Target file {new_file_path} already exists. Overwriting.")
-                try:
-                    new_file_path.unlink()
-                except Exception as del_err:
-                    return {
-                        "status": "error",
-                        "message": f"Cannot overwrite existing target file: {del_err}"
-                    }
-
-            src_path.rename(new_file_path)
-            logging.info(f"File renamed locally from {src_path} to {new_file_path}")
-            file_to_upload = new_file_path
+    try:
+        date_part = original_filename.split(' - ')[0]
+        dt.datetime.strptime(date_part, '%Y-%m-%d')
+        datum = date_part
+    except (ValueError, IndexError):
+        return None, f"Could not extract valid date from filename: {original_filename}"
+
+    new_filename = f"predigt-{datum}_Treffpunkt_Leben_Karlsruhe.mp3"
+    new_file_path = src_path.parent / new_filename
+
+    if new_file_path.exists():
+        logging.warning(f"Target file {new_file_path} already exists. Overwriting.")
+        try:
+            new_file_path.unlink()
+        except Exception as del_err:
+            return None, f"Cannot overwrite existing target file: {del_err}"
+
+    src_path.rename(new_file_path)
+    logging.info(f"File renamed locally from {src_path} to {new_file_path}")
+    return new_file_path, None
+
+@app.post("/server/upload")
+async def upload_file_to_server(req: UploadFileRequest):
+    """Upload a file to the FTP server with proper renaming."""
+    try:
+        logging.info(f"Uploading file to server: {req.file_path}")
+
+        await lazy.resolve(server_interact)
+        file_to_upload, error = await asyncio.to_thread(prepare_upload_file, req.file_path)
+        if error:
+            return {"status": "error", "message": error}
 
         await asyncio.to_thread(server_interact.send_file_to_server, str(file_to_upload))
         logging.info(f"File uploaded to server: {file_to_upload.name}")
@@ -393,10 +771,55 @@ async def upload_file_to_server(req: UploadFileRequest):
         logging.error(f"Error uploading file to server: {e}", exc_info=True)
         return {"status": "error", "message": f"Upload failed: {str(e)}"}
 
+@app.post("/server/upload/stream")
+async def upload_file_to_server_stream(req: UploadFileRequest):
+    """
+    Upload a file to the FTP server, streaming byte-level progress as NDJSON.
+    Interrupted uploads resume where they stopped; files already complete on the server are skipped.
+    """
+    logging.info(f"Uploading file to server (streaming): {req.file_path}")
+
+    async def upload_generator() -> AsyncGenerator[str, None]:
+        try:
+            await lazy.resolve(server_interact)
+            file_to_upload, error = await asyncio.to_thread(prepare_upload_file, req.file_path)
+            if error:
+                yield json.dumps({"step": "error", "status": "failed", "message": error}) + "\n"
+                return
+
+            skipped = False
+            async for update in run_sync_generator(server_interact.upload_file(str(file_to_upload))):
+                skipped = update["status"] == "skipped"
+                if skipped:
+                    update["message"] = "Datei ist bereits vollständig auf dem Server."
+                else:
+                    update["message"] = f"Lade hoch... {update['percent']:.0f}%"
+                update["step"] = "upload"
+                update["progress"] = f"{update['percent']:.0f}"
+                yield json.dumps(update) + "\n"
+            logging.info(f"File uploaded to server: {file_to_upload.name}")
+
+            if not skipped:
+                await asyncio.to_thread(server_interact.send_update_request)
+                logging.info("Update request sent to server")
+
+            yield json.dumps({
+                "step": "complete",
+                "status": "completed",
+                "progress": "100",
+                "message": f"File uploaded successfully as: {file_to_upload.name}",
+                "uploaded_filename": file_to_upload.name
+            }) + "\n"
+        except Exception as e:
+            logging.error(f"Error uploading file to server: {e}", exc_info=True)
+            yield json.dumps({"step": "error", "status": "failed", "message": f"Upload failed: {str(e)}"}) + "\n"
+    return StreamingResponse(upload_generator(), media_type="application/x-ndjson")
+
 @app.post("/server/check-file")
 async def check_file_on_server(req: UploadFileRequest):
     """Check if a file exists on the FTP server."""
     try:
+        await lazy.resolve(server_interact)
         exists = await asyncio.to_thread(server_interact.check_if_file_on_server, req.file_path)
         return {
             "status": "success",
@@ -410,10 +833,28 @@ async def check_file_on_server(req: UploadFileRequest):
             "message": f"Check failed: {str(e)}"
         }
 
+@app.post("/server/check-files")
+async def check_files_on_server(req: CheckFilesRequest):
+    """Check in one request which of several files exist on the FTP server."""
+    try:
+        await lazy.resolve(server_interact)
+        files = await asyncio.to_thread(server_interact.check_files_on_server, req.file_paths)
+        return {
+            "status": "success",
+            "files": files
+        }
+    except Exception as e:
+        logging.error(f"Error checking files on server: {e}")
+        return {
+            "status": "error", 
+            "message": f"Check failed: {str(e)}"
+        }
+
 @app.get("/website/themes")
 async def get_predigt_themes():
     """Get themes from the website."""
     try:
+        await lazy.resolve(server_interact)
         themes = await asyncio.to_thread(server_interact.get_themes_of_predigten)
         return {
             "status": "success",
@@ -429,6 +870,7 @@ async def get_predigt_themes():
 async def list_server_files():
     """List all files on the FTP server."""
     try:
+        await lazy.resolve(server_interact)
         files = await asyncio.to_thread(server_interact.list_files_on_server)
         return {
             "status": "success",
@@ -445,6 +887,7 @@ async def list_server_files():
 async def send_website_update():
     """Send update request to the website."""
     try:
+        await lazy.resolve(server_interact)
         await asyncio.to_thread(server_interact.send_update_request)
         return {
             "status": "success", 
@@ -0,0 +1,22 @@
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+# The backend modules import each other as top-level packages (main, functions, utils)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+_state_dir = None
+
+
+def pytest_configure(config):
+    # Importing main creates config.json and the log directory; keep them out of the tree
+    global _state_dir
+    _state_dir = tempfile.mkdtemp(prefix="backend-tests-")
+    os.environ["BACKEND_CONFIG_PATH"] = os.path.join(_state_dir, "config.json")
+    os.environ["BACKEND_LOG_DIR"] = os.path.join(_state_dir, "log")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_state_dir, ignore_errors=True)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from functions.analysis import WINDOW_SECONDS, propose_boundaries
+
+
+def test_empty_input():
+    result = propose_boundaries(np.zeros(0), np.zeros(0))
+    assert result["duration"] == 0
+    assert result["proposed"] is None
+
+
+@pytest.mark.parametrize("windows", [1, 5, 50, 59, 60, 61])
+def test_short_input_stays_within_the_recording(windows):
+    level_db = np.full(windows, -20.0)
+    modulation_db = np.random.default_rng(0).normal(0, 6, windows)
+    result = propose_boundaries(level_db, modulation_db)
+    assert result["duration"] == windows * WINDOW_SECONDS
+    if result["proposed"]:
+        assert 0 <= result["proposed"]["start"] <= result["proposed"]["end"] <= result["duration"]
+
+
+def test_sermon_between_music_is_proposed():
+    # Music (steady energy), a pause, 10 minutes of speech (fluctuating energy), a pause, music
+    parts = [(400, -20.0, 2.0), (20, -70.0, 0.0), (1200, -20.0, 12.0), (20, -70.0, 0.0), (400, -20.0, 2.0)]
+    level_db = np.concatenate([np.full(n, level) for n, level, _ in parts])
+    modulation_db = np.concatenate([np.full(n, modulation) for n, _, modulation in parts])
+    result = propose_boundaries(level_db, modulation_db)
+    # Snapped to the centers of the pauses
+    assert result["proposed"] == {"start": 205.0, "end": 815.0}
+    assert [c["time"] for c in result["candidates"]] == [205.0, 815.0]
@@ -0,0 +1,104 @@
+import os
+
+from functions import cache
+
+SETTINGS = {"threshold_db": -12, "ratio": 2, "attack": 200, "release": 1000}
+
+
+def _entries(directory, sizes):
+    """Files of the given sizes, oldest first."""
+    paths = []
+    for i, size in enumerate(sizes):
+        path = directory / f"entry{i}.mp3"
+        path.write_bytes(b"x" * size)
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(path)
+    return paths
+
+
+def test_key_depends_on_video_and_encoding_settings():
+    key = cache.cache_key("video", SETTINGS)
+    assert cache.cache_key("video", dict(SETTINGS)) == key
+    assert cache.cache_key("other", SETTINGS) != key
+    assert cache.cache_key("video", {**SETTINGS, "ratio": 4}) != key
+
+
+def test_key_depends_on_how_the_audio_was_produced():
+    key = cache.cache_key("video", {**SETTINGS, "single_pass": True, "parallel_encode": False})
+    assert cache.cache_key("video", {**SETTINGS, "single_pass": False, "parallel_encode": False}) != key
+    assert cache.cache_key("video", {**SETTINGS, "single_pass": True, "parallel_encode": True}) != key
+
+
+def test_store_and_restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    encoded = tmp_path / "compressed.mp3"
+    encoded.write_bytes(b"audio")
+    key = cache.cache_key("video", SETTINGS)
+    cache.store(key, str(encoded))
+
+    restored = tmp_path / "restored.mp3"
+    assert cache.restore(key, str(restored))
+    assert restored.read_bytes() == b"audio"
+    assert not cache.restore(cache.cache_key("other", SETTINGS), str(restored))
+
+
+def test_evict_removes_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    paths = _entries(tmp_path, [100, 100, 100])
+    cache.evict(200)
+    assert [p.exists() for p in paths] == [False, True, True]
+
+
+def test_evict_skips_kept_and_part_files(tmp_path):
+    paths = _entries(tmp_path, [100, 100, 100])
+    (tmp_path / "entry9.part").write_bytes(b"x" * 1000)
+    cache._evict(tmp_path, "*", 100, keep=paths[0])
+    assert [p.exists() for p in paths] == [True, False, False]
+    assert (tmp_path / "entry9.part").exists()
+
+
+def test_whole_video_source_serves_its_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "SOURCE_DIR", tmp_path / "sources")
+    download = tmp_path / "temp_audio.opus"
+    download.write_bytes(b"x" * 100)
+
+    stored = cache.store_source("video", None, None, str(download))
+    assert not download.exists()
+    assert cache.lookup_source("video") == (stored, True)
+    assert cache.lookup_source("video", 10, 20) == (stored, False)
+    assert cache.lookup_source("other") is None
+
+
+def test_evict_skips_leased_sources(tmp_path):
+    paths = _entries(tmp_path, [100, 100, 100])
+    cache.lease_source(str(paths[0]))
+    cache.lease_source(str(paths[0]))
+    try:
+        cache._evict(tmp_path, "*.mp3", 0)
+        assert [p.exists() for p in paths] == [True, False, False]
+        cache.release_source(str(paths[0]))
+        cache._evict(tmp_path, "*.mp3", 0)
+        assert paths[0].exists()
+    finally:
+        cache.release_source(str(paths[0]))
+    cache._evict(tmp_path, "*.mp3", 0)
+    assert not paths[0].exists()
+
+
+def test_store_source_leases_before_evicting(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "SOURCE_DIR", tmp_path / "sources")
+    monkeypatch.setattr(cache, "_source_max_bytes", lambda: 0)
+    download = tmp_path / "temp_audio.opus"
+    download.write_bytes(b"x" * 100)
+
+    stored = cache.store_source("video", None, None, str(download), lease=True)
+    try:
+        assert os.path.exists(stored)
+        assert cache.lookup_source("video", 10, 20, lease=True) == (stored, False)
+        cache.release_source(stored)
+        cache._evict(cache.SOURCE_DIR, "*", 0)
+        assert os.path.exists(stored)
+    finally:
+        cache.release_source(stored)
+    cache._evict(cache.SOURCE_DIR, "*", 0)
+    assert not os.path.exists(stored)
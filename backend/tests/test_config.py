@@ -0,0 +1,24 @@
+import json
+
+import main
+from functions import cache, jobs
+
+
+def test_reload_reaches_every_loaded_module(monkeypatch):
+    monkeypatch.setattr(jobs, "DOWNLOAD_SLOTS", jobs.DOWNLOAD_SLOTS)
+    monkeypatch.setattr(jobs, "ENCODE_SLOTS", jobs.ENCODE_SLOTS)
+    monkeypatch.setattr(jobs, "_download_slots", jobs._download_slots)
+    monkeypatch.setattr(jobs, "_encode_slots", jobs._encode_slots)
+    original = main.CONFIG_PATH.read_text() if main.CONFIG_PATH.exists() else None
+    try:
+        main.CONFIG_PATH.write_text(json.dumps({"cache_max_mb": 1, "max_concurrent_encodes": 7}))
+        main.reload_config()
+        assert cache._max_bytes() == 1024 * 1024
+        assert jobs.ENCODE_SLOTS == 7
+        assert jobs._encode_slots._initial_value == 7
+    finally:
+        if original is None:
+            main.CONFIG_PATH.unlink()
+        else:
+            main.CONFIG_PATH.write_text(original)
+        main.reload_config()
@@ -0,0 +1,22 @@
+import math
+
+from functions.download import MAX_NORMALIZATION_GAIN, normalization_gain
+
+SETTINGS = {"loudness_target": -16.0, "true_peak": -1.5}
+
+
+def test_gain_reaches_the_target():
+    assert normalization_gain({"input_i": -23.0, "input_tp": -10.0}, SETTINGS) == 7.0
+
+
+def test_gain_is_limited_by_the_true_peak():
+    assert normalization_gain({"input_i": -23.0, "input_tp": -3.0}, SETTINGS) == 1.5
+
+
+def test_gain_is_capped():
+    assert normalization_gain({"input_i": -70.0, "input_tp": -60.0}, SETTINGS) == MAX_NORMALIZATION_GAIN
+
+
+def test_silence_is_not_normalized():
+    assert normalization_gain({"input_i": -math.inf, "input_tp": -math.inf}, SETTINGS) is None
+    assert normalization_gain({"input_i": -23.0, "input_tp": math.nan}, SETTINGS) is None
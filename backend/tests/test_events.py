@@ -0,0 +1,42 @@
+import asyncio
+
+from functions.events import EventBus
+
+
+def test_listen_replays_history_after_seq_then_delivers_live():
+    bus = EventBus()
+    first = bus.publish("job", {"step": "download", "progress": "05"})
+    second = bus.publish("job", {"step": "download", "progress": "15"})
+    bus.publish("other", {"step": "download", "progress": "05"})
+
+    async def run():
+        with bus.listen("job", after=first["seq"]) as (replay, queue):
+            assert [e["seq"] for e in replay] == [second["seq"]]
+            live = bus.publish("job", {"step": "compress", "progress": "20"})
+            assert await asyncio.wait_for(queue.get(), 1) == live
+            assert queue.empty()
+        with bus.listen(None) as (replay, queue):
+            assert [e["job_id"] for e in replay] == ["job", "job", "other", "job"]
+
+    asyncio.run(run())
+
+
+def test_sequence_numbers_grow_and_respect_the_seed():
+    bus = EventBus()
+    first = bus.publish("job", {"step": "download"})
+    bus.seed(first["seq"] + 1000)
+    second = bus.publish("job", {"step": "download"})
+    assert second["seq"] == first["seq"] + 1001
+    bus.seed(0)
+    assert bus.publish("job", {"step": "download"})["seq"] == second["seq"] + 1
+
+
+def test_progress_never_moves_backwards_until_cleared():
+    bus = EventBus()
+    bus.publish("job", {"step": "compress", "progress": "60"})
+    assert bus.publish("job", {"step": "compress", "progress": "15"})["progress"] == 60.0
+    assert bus.publish("job", {"step": "error", "status": "failed"})["progress"] == 60.0
+    assert bus.publish("job", {"step": "compress", "progress": "70"})["progress"] == 70.0
+    bus.clear("job")
+    assert bus.history("job") == []
+    assert bus.publish("job", {"step": "download", "progress": "05"})["progress"] == 5.0
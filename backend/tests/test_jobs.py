@@ -0,0 +1,64 @@
+import asyncio
+
+from functions import events, jobs
+from functions.jobs import _completed_stages
+
+
+def _job(stage, **artifacts):
+    return {"stage": stage, "artifacts": artifacts}
+
+
+def test_no_stage_means_nothing_done():
+    assert _completed_stages(_job(None)) == []
+
+
+def test_stages_with_existing_artifacts_are_done(tmp_path):
+    downloaded = tmp_path / "source.opus"
+    compressed = tmp_path / "compressed.mp3"
+    downloaded.write_bytes(b"x")
+    compressed.write_bytes(b"x")
+    job = _job("tags", downloaded_path=str(downloaded), compressed_path=str(compressed))
+    assert _completed_stages(job) == ["download", "compress", "tags"]
+
+
+def test_missing_artifact_resumes_from_that_stage(tmp_path):
+    downloaded = tmp_path / "source.opus"
+    downloaded.write_bytes(b"x")
+    job = _job("tags", downloaded_path=str(downloaded), compressed_path=str(tmp_path / "gone.mp3"))
+    assert _completed_stages(job) == ["download"]
+
+
+def test_compressed_audio_makes_the_download_moot(tmp_path):
+    compressed = tmp_path / "compressed.mp3"
+    compressed.write_bytes(b"x")
+    job = _job("compress", downloaded_path=str(tmp_path / "evicted.opus"), compressed_path=str(compressed))
+    assert _completed_stages(job) == ["download", "compress"]
+
+
+def test_finalized_files_prove_all_stages(tmp_path):
+    final = tmp_path / "predigt.mp3"
+    rendition = tmp_path / "predigt.opus"
+    final.write_bytes(b"x")
+    rendition.write_bytes(b"x")
+    # The work files were moved away by finalize and the source was evicted
+    job = _job("finalize", downloaded_path=str(tmp_path / "evicted.opus"),
+               compressed_path=str(tmp_path / "moved.mp3"), final_path=str(final),
+               rendition_final_paths=[str(rendition)])
+    assert _completed_stages(job) == ["download", "compress", "tags", "finalize"]
+
+    rendition.unlink()
+    assert _completed_stages(job) == []
+
+
+def test_resumed_job_does_not_replay_the_error_of_its_last_run(monkeypatch):
+    error = {"step": "error", "status": "failed", "seq": 1}
+    monkeypatch.setattr(jobs, "get_job", lambda job_id: {"status": "queued", "last_event": error})
+
+    async def run():
+        stream = jobs.subscribe("resumed")
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.1)
+        events.bus.publish("resumed", {"step": "complete", "status": "completed", "progress": "100"})
+        return await asyncio.wait_for(first, 1)
+
+    assert asyncio.run(run())["step"] == "complete"
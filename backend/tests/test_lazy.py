@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+RESTORE = """
+import sys
+import main
+from functions import jobs
+tmp = jobs.Path(sys.argv[1])
+jobs.DB_PATH, jobs.WORK_DIR, jobs.LEGACY_WORK_DIR = tmp / "jobs.db", tmp / "work", tmp / "legacy"
+main.restore_jobs()
+print(*(name in sys.modules for name in ("yt_dlp", "numpy", "functions.download")))
+"""
+
+
+def test_restoring_jobs_does_not_import_the_heavy_modules(tmp_path):
+    # A fresh interpreter, since other tests import these modules
+    result = subprocess.run([sys.executable, "-c", RESTORE, str(tmp_path)], cwd=BACKEND_DIR,
+                            env=os.environ, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False", "False"]
@@ -0,0 +1,163 @@
+import ftplib
+import threading
+import time
+
+import pytest
+
+from functions import server_interact
+from functions.server_interact import FTPPool
+
+
+class FakeSession:
+    def voidcmd(self, cmd):
+        return "200 OK"
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_slow_connect_does_not_block_the_pool(monkeypatch):
+    pool = FTPPool(max_size=2)
+    connecting = threading.Event()
+
+    def slow_connect():
+        connecting.set()
+        time.sleep(1)
+        return FakeSession()
+
+    monkeypatch.setattr(pool, "_connect", slow_connect)
+
+    def borrow():
+        with pool.session():
+            pass
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    connecting.wait(1)
+    start = time.monotonic()
+    pool.invalidate()
+    assert time.monotonic() - start < 0.5
+    thread.join()
+
+
+def test_acquire_times_out_when_all_sessions_are_in_use(monkeypatch):
+    pool = FTPPool(max_size=1, acquire_timeout=0.2)
+    monkeypatch.setattr(pool, "_connect", FakeSession)
+    with pool.session():
+        with pytest.raises(ftplib.error_temp):
+            with pool.session():
+                pass
+    with pool.session() as session:
+        assert isinstance(session, FakeSession)
+
+
+def test_streaming_uploads_are_limited_to_their_allowance(monkeypatch):
+    received = []
+    monkeypatch.setattr(server_interact, "_streaming_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(server_interact, "upload_stream", lambda name, chunks: received.extend(chunks))
+
+    uploader = server_interact.start_streaming_upload("a.mp3")
+    assert uploader is not None
+    assert server_interact.start_streaming_upload("b.mp3") is None
+    uploader.put(b"data")
+    assert uploader.finish() is None
+    assert received == [b"data"]
+
+    uploader = server_interact.start_streaming_upload("b.mp3")
+    assert uploader is not None
+    uploader.finish()
+
+
+class FakeFTPServer(FakeSession):
+    """In-memory server for the upload commands."""
+
+    def __init__(self, files=None):
+        self.files = dict(files or {})
+        self.stores = []
+
+    def size(self, name):
+        if name not in self.files:
+            raise ftplib.error_perm("550 No such file")
+        return len(self.files[name])
+
+    def transfercmd(self, cmd, rest=None):
+        verb, name = cmd.split(" ", 1)
+        self.stores.append((name, rest))
+        data = self.files[name][:rest] if rest else b""
+        server = self
+
+        class Conn:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                server.files[name] = data
+
+            def sendall(self, block):
+                nonlocal data
+                data += block
+
+        return Conn()
+
+    def voidresp(self):
+        return "226 OK"
+
+    def rename(self, old, new):
+        self.files[new] = self.files.pop(old)
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+
+@pytest.fixture
+def ftp_server(monkeypatch, tmp_path):
+    def serve(files=None):
+        server = FakeFTPServer(files)
+        pool = FTPPool(max_size=1)
+        monkeypatch.setattr(pool, "_connect", lambda: server)
+        monkeypatch.setattr(server_interact, "_pool", pool)
+        return server
+
+    monkeypatch.setattr(server_interact, "UPLOAD_RECORD_PATH", str(tmp_path / "ftp_uploads.json"))
+    return serve
+
+
+def test_upload_does_not_resume_a_foreign_file_with_the_same_name(ftp_server, tmp_path):
+    path = tmp_path / "predigt.mp3"
+    path.write_bytes(b"new content")
+    server = ftp_server({"predigt.mp3": b"old"})
+
+    updates = list(server_interact.upload_file(str(path)))
+
+    assert updates[-1]["status"] == "completed"
+    assert server.files == {"predigt.mp3": b"new content"}
+    assert all(rest is None for _, rest in server.stores)
+
+
+def test_upload_skips_only_content_it_uploaded_itself(ftp_server, tmp_path):
+    path = tmp_path / "predigt.mp3"
+    path.write_bytes(b"new content")
+    server = ftp_server({"predigt.mp3": b"old content"})  # same size, different content
+
+    assert list(server_interact.upload_file(str(path)))[-1]["status"] == "completed"
+    assert server.files["predigt.mp3"] == b"new content"
+
+    assert list(server_interact.upload_file(str(path)))[-1]["status"] == "skipped"
+    path.write_bytes(b"other bytes")
+    assert list(server_interact.upload_file(str(path)))[-1]["status"] == "completed"
+    assert server.files["predigt.mp3"] == b"other bytes"
+
+
+def test_upload_resumes_its_own_partial(ftp_server, tmp_path):
+    path = tmp_path / "predigt.mp3"
+    path.write_bytes(b"new content")
+    temp_name = f"predigt.mp3.{server_interact._file_digest(str(path))[:12]}.part"
+    server = ftp_server({temp_name: b"new c"})
+
+    list(server_interact.upload_file(str(path)))
+
+    assert server.stores == [(temp_name, 5)]
+    assert server.files == {"predigt.mp3": b"new content"}
@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Run from anywhere: the functions modules import `main` from the backend directory
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(BACKEND_DIR)
+
+from functions import download
+from functions import parallel_encode
+from utils.setup_ffmpeg import get_toolkit
+
+
+def ffmpeg_executable():
+    return get_toolkit().ffmpeg
+
+
+def make_test_file(path, seconds):
+    """Synthetic stand-in for a livestream: noise plus a tone with a speech-like level envelope."""
+    subprocess.run([
+        ffmpeg_executable(), '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'anoisesrc=d={seconds}:c=pink:r=48000:a=0.5',
+        '-f', 'lavfi', '-i', f'sine=f=220:d={seconds}:r=48000',
+        '-filter_complex', "[0][1]amix=inputs=2,volume='0.2+0.8*abs(sin(2*PI*0.3*t))':eval=frame,"
+                           "aformat=channel_layouts=stereo",
+        '-c:a', 'libopus', '-b:a', '96k', path
+    ], check=True)
+
+
+def decoded_samples(path, *args):
+    """Number of samples a player outputs for `path` (encoder delay and padding removed)."""
+    pcm = subprocess.run([ffmpeg_executable(), '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1', *args, '-'],
+                         capture_output=True, check=True).stdout
+    return len(pcm) // 2
+
+
+def timed(encode, *args, **kwargs):
+    start = time.time()
+    for update in encode(*args, **kwargs):
+        pass
+    return time.time() - start
+
+
+def benchmark(source, duration):
+    cores = os.cpu_count() or 1
+    print(f"=== Encoding {duration / 60:.0f} min of audio, {cores} cores ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        serial_path = os.path.join(tmp, 'serial.mp3')
+        serial_time = timed(download.compress_audio, source, serial_path, duration)
+        serial_samples = decoded_samples(serial_path)
+        print(f"serial:     {serial_time:6.1f}s  ({duration / serial_time:5.1f}x realtime)")
+
+        workers = 1
+        while True:
+            parallel_path = os.path.join(tmp, f'parallel_{workers}.mp3')
+            parallel_time = timed(parallel_encode.compress_audio_parallel, source, parallel_path, duration,
+                                  workers=workers)
+            same_length = decoded_samples(parallel_path) == serial_samples
+            print(f"{workers:2d} workers: {parallel_time:6.1f}s  ({duration / parallel_time:5.1f}x realtime, "
+                  f"speedup {serial_time / parallel_time:4.2f}, "
+                  f"{'✓ same length' if same_length else '❌ length differs'})")
+            if workers >= cores:
+                break
+            workers = min(workers * 2, cores)
+
+
+if __name__ == "__main__":
+    # Usage: python utils/benchmark_encode.py [audio file]  (default: 30 synthetic minutes)
+    if len(sys.argv) > 1:
+        source = sys.argv[1]
+        benchmark(source, download.get_audio_duration(source) or decoded_samples(source, '-ar', '8000') / 8000)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.opus')
+            make_test_file(source, 30 * 60)
+            benchmark(source, 30 * 60)
@@ -1,20 +1,172 @@
 import os
+import re
+import time
+import hashlib
 import requests
 import zipfile
 import shutil
 import json
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
+from typing import Dict, Any, Optional, Set
 import logging
 
+BACKEND_DIR = Path(__file__).parent.parent  # Go up from utils/ to backend/
+# Probe results of the ffmpeg binary, reused as long as the binary doesn't change
+CAPABILITIES_FILE = BACKEND_DIR / 'ffmpeg_capabilities.json'
+
+# Encoders per codec, best first; the first one the binary was built with is used
+ENCODER_PREFERENCE = {
+    "mp3": ["libmp3lame", "libshine", "mp3_mf"],
+    "opus": ["libopus", "opus"],
+    "aac": ["libfdk_aac", "aac"],
+}
+# Encoders ffmpeg only runs with `-strict experimental`
+EXPERIMENTAL_ENCODERS = {"opus"}
+
+# " A....D libmp3lame  ..." in -encoders, " ..C acompressor  A->A ..." in -filters
+_LISTING_LINE = re.compile(r'^\s*([A-Z.|]{3,6})\s+([\w-]+)\s')
+
+
+class FFmpegToolkit:
+    """
+    The resolved ffmpeg/ffprobe binaries and what they can do. Resolved and probed
+    once per process (see `get_toolkit`); the probe result is cached on disk.
+    """
+
+    def __init__(self, location: Optional[str], ffmpeg: str, ffprobe: str):
+        self.location = location  # Directory of the bundled binaries, None = system PATH
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version: Optional[str] = None
+        self.encoders: Set[str] = set()
+        self.filters: Set[str] = set()
+        self.probed = False
+
+    def _binary_key(self) -> Optional[Dict[str, Any]]:
+        path = self.ffmpeg if self.location else shutil.which(self.ffmpeg)
+        if not path:
+            return None
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        return {"path": path, "mtime": stat.st_mtime, "size": stat.st_size}
+
+    def _run(self, *args) -> str:
+        return subprocess.run([self.ffmpeg, '-hide_banner', *args], capture_output=True, text=True,
+                              errors='replace', timeout=30, check=True).stdout
+
+    @staticmethod
+    def _listed_names(output: str) -> Set[str]:
+        return {match.group(2) for match in map(_LISTING_LINE.match, output.splitlines())
+                if match and match.group(2) != '='}
+
+    def probe(self):
+        """Reads version, encoders and filters from the disk cache, or asks the binary once."""
+        try:
+            key = self._binary_key()
+        except OSError as e:
+            logging.warning(f"Could not stat the ffmpeg binary: {e}")
+            key = None
+        try:
+            with open(CAPABILITIES_FILE, 'r') as f:
+                cached = json.load(f)
+            if key is not None and cached.get("binary") == key:
+                self.version = cached["version"]
+                self.encoders = set(cached["encoders"])
+                self.filters = set(cached["filters"])
+                self.probed = True
+                return
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+        try:
+            version_line = self._run('-version').split('\n', 1)[0]
+            self.version = version_line.split()[2] if len(version_line.split()) > 2 else version_line
+            self.encoders = self._listed_names(self._run('-encoders'))
+            self.filters = self._listed_names(self._run('-filters'))
+            self.probed = True
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.warning(f"Could not probe ffmpeg capabilities: {e}")
+            return
+        logging.info(f"ffmpeg {self.version}: {len(self.encoders)} encoders, {len(self.filters)} filters")
+        if key is not None:
+            try:
+                tmp_path = CAPABILITIES_FILE.with_suffix('.json.part')
+                with open(tmp_path, 'w') as f:
+                    json.dump({"binary": key, "version": self.version,
+                               "encoders": sorted(self.encoders), "filters": sorted(self.filters)}, f)
+                os.replace(tmp_path, CAPABILITIES_FILE)
+            except OSError as e:
+                logging.warning(f"Could not cache ffmpeg capabilities: {e}")
+
+    def has_encoder(self, name: str) -> bool:
+        # Without a probe result nothing is known; let ffmpeg report what's missing
+        return not self.probed or name in self.encoders
+
+    def has_filter(self, name: str) -> bool:
+        return not self.probed or name in self.filters
+
+    def encoder_for(self, codec: str) -> str:
+        """The preferred available encoder for mp3/opus/aac."""
+        candidates = ENCODER_PREFERENCE[codec]
+        return next((name for name in candidates if self.has_encoder(name)), candidates[0])
+
+    def encoder_args(self, codec: str) -> Dict[str, Any]:
+        """ffmpeg-python output options selecting the encoder for `codec`."""
+        encoder = self.encoder_for(codec)
+        args = {'acodec': encoder}
+        if encoder in EXPERIMENTAL_ENCODERS:
+            args['strict'] = 'experimental'
+        return args
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "location": self.location or "PATH",
+            "version": self.version,
+            "encoders": {codec: self.encoder_for(codec) for codec in ENCODER_PREFERENCE} if self.probed else None,
+            "loudnorm": self.has_filter("loudnorm") if self.probed else None,
+        }
+
+
+_toolkit: Optional[FFmpegToolkit] = None
+_toolkit_lock = threading.Lock()
+
+
+def get_toolkit() -> FFmpegToolkit:
+    """
+    The process-wide ffmpeg toolkit: resolves the binaries (downloading them if needed)
+    and probes their capabilities on the first call, then returns the same object.
+    """
+    global _toolkit
+    if _toolkit is None:
+        with _toolkit_lock:
+            if _toolkit is None:
+                location = _resolve_ffmpeg_path()
+                if location:
+                    toolkit = FFmpegToolkit(location, str(Path(location) / 'ffmpeg.exe'),
+                                            str(Path(location) / 'ffprobe.exe'))
+                else:
+                    toolkit = FFmpegToolkit(None, 'ffmpeg', 'ffprobe')
+                toolkit.probe()
+                _toolkit = toolkit
+    return _toolkit
+
+
 def get_ffmpeg_path():
-    """Get the path to bundled FFmpeg or system FFmpeg."""
-    backend_dir = Path(__file__).parent.parent  # Go up from utils/ to backend/
-    bundled_ffmpeg = backend_dir / 'ffmpeg' / 'ffmpeg.exe'
-    bundled_ffprobe = backend_dir / 'ffmpeg' / 'ffprobe.exe'
+    """Get the path to bundled FFmpeg, or None for system FFmpeg. Resolved once per process."""
+    return get_toolkit().location
+
+
+def _resolve_ffmpeg_path():
+    """Finds bundled FFmpeg or system FFmpeg, downloading it if neither exists."""
+    bundled_ffmpeg = BACKEND_DIR / 'ffmpeg' / 'ffmpeg.exe'
+    bundled_ffprobe = BACKEND_DIR / 'ffmpeg' / 'ffprobe.exe'
     
     # Check if bundled FFmpeg exists
     if bundled_ffmpeg.exists() and bundled_ffprobe.exists():
-        return str(backend_dir / 'ffmpeg')
+        return str(BACKEND_DIR / 'ffmpeg')
     
     # Check if system FFmpeg exists
     if shutil.which('ffmpeg') and shutil.which('ffprobe'):
@@ -27,7 +179,7 @@ def get_ffmpeg_path():
         
         # Check again after download
         if bundled_ffmpeg.exists() and bundled_ffprobe.exists():
-            return str(backend_dir / 'ffmpeg')
+            return str(BACKEND_DIR / 'ffmpeg')
     except Exception as e:
         logging.error(f"Failed to auto-download FFmpeg: {e}")
     
@@ -35,148 +187,276 @@ def get_ffmpeg_path():
         "FFmpeg not found. Please install FFmpeg or place ffmpeg.exe and ffprobe.exe in the backend/ffmpeg/ directory."
     )
 
-def get_latest_ffmpeg_url():
+# Static builds only, in order of preference: only ffmpeg.exe and ffprobe.exe get installed
+FALLBACK_URLS = [
+    # BtbN builds - most reliable
+    "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip",
+    # Alternative gyan.dev URL format
+    "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip",
+]
+EXECUTABLES = ('ffmpeg.exe', 'ffprobe.exe')
+DOWNLOAD_PARTS = 4  # parallel ranged requests
+MIN_PART_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# After the first mirror answers, preferred mirrors still get this long (s) to answer too
+MIRROR_PREFERENCE_WINDOW = 1.0
+
+
+def _probe_mirror(url):
+    """HEAD request: returns the mirror's size and range support, or raises if it isn't usable."""
+    # Allow redirects for GitHub URLs
+    response = requests.head(url, timeout=15, allow_redirects=True)
+    if response.status_code != 200:
+        raise Exception(f"HTTP {response.status_code}")
+    # Verify content-length exists and is at least 1MB (means it's a real file)
+    size = int(response.headers.get('content-length') or 0)
+    if size < 1000000:
+        raise Exception("File too small or no content-length")
+    return {
+        "url": url,
+        "size": size,
+        "ranges": response.headers.get('accept-ranges', '').lower() == 'bytes',
+    }
+
+
+def find_ffmpeg_mirror(urls=None):
+    """
+    Probes all mirrors at once. Once one answers, mirrors earlier in the list get
+    MIRROR_PREFERENCE_WINDOW seconds to answer as well; the earliest usable one wins.
+    """
+    urls = urls or FALLBACK_URLS
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    futures = {executor.submit(_probe_mirror, url): priority for priority, url in enumerate(urls)}
+    pending = set(futures)
+    best = None  # (priority, mirror)
+    deadline = None
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not finished:
+                break  # Preferred mirrors too slow
+            for future in finished:
+                try:
+                    mirror = future.result()
+                except Exception as e:
+                    print(f"DEBUG: {urls[futures[future]]} failed: {e}")
+                    continue
+                if best is None or futures[future] < best[0]:
+                    best = (futures[future], mirror)
+                if deadline is None:
+                    deadline = time.monotonic() + MIRROR_PREFERENCE_WINDOW
+            if best and not any(futures[future] < best[0] for future in pending):
+                break
+    finally:
+        # Don't wait for slower mirrors
+        executor.shutdown(wait=False, cancel_futures=True)
+    if best is None:
+        raise Exception("Could not find a valid FFmpeg download URL")
+    mirror = best[1]
+    print(f"DEBUG: Using {mirror['url']} ({mirror['size']/1024/1024:.1f} MB)")
+    return mirror
+
+
+def get_latest_ffmpeg_url(urls=None):
     """Get the latest FFmpeg download URL from working sources."""
-    print("DEBUG: Starting URL search...")
-    
-    fallback_urls = [
-        # BtbN builds - most reliable
-        "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip",
-        # Essentials build (smaller)
-        "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl-shared.zip",
-        # Alternative gyan.dev URL format
-        "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip",
-        # Backup static link
-        "https://github.com/BtbN/FFmpeg-Builds/releases/download/autobuild-2023-08-20-12-46/ffmpeg-master-latest-win64-gpl.zip"
-    ]
-    
-    # Test each URL
-    for i, url in enumerate(fallback_urls):
+    return find_ffmpeg_mirror(urls)["url"]
+
+
+def get_expected_sha256(url):
+    """
+    The published SHA-256 of the archive at `url`: from the FFMPEG_SHA256 environment
+    variable, a `<archive>.sha256` file (gyan.dev) or the release's checksums.sha256 (BtbN).
+    """
+    if os.getenv("FFMPEG_SHA256"):
+        return os.getenv("FFMPEG_SHA256").strip().lower()
+    name = url.rsplit('/', 1)[-1]
+    for checksum_url in (f"{url}.sha256", f"{url.rsplit('/', 1)[0]}/checksums.sha256"):
         try:
-            print(f"DEBUG: Testing URL {i+1}: {url}")
-            
-            # Allow redirects for GitHub URLs
-            response = requests.head(url, timeout=15, allow_redirects=True)
-            print(f"DEBUG: URL {i+1} response: {response.status_code}")
-            
-            if response.status_code == 200:
-                print(f"DEBUG: Success! Using URL: {url}")
-                
-                # Additional check: verify content-length exists (means it's a real file)
-                content_length = response.headers.get('content-length')
-                if content_length and int(content_length) > 1000000:  # At least 1MB
-                    print(f"DEBUG: File size looks good: {int(content_length)/1024/1024:.1f} MB")
-                    return url
-                else:
-                    print(f"DEBUG: File too small or no content-length, trying next...")
-                    
-        except Exception as e:
-            print(f"DEBUG: URL {i+1} failed: {e}")
+            response = requests.get(checksum_url, timeout=15)
+            if response.status_code != 200:
+                continue
+        except requests.RequestException:
             continue
-    
-    print("DEBUG: All URLs failed!")
-    raise Exception("Could not find a valid FFmpeg download URL")
+        for line in response.text.splitlines():
+            fields = line.split()
+            if len(fields) == 1 and re.fullmatch(r'[0-9a-fA-F]{64}', fields[0]):
+                return fields[0].lower()
+            if len(fields) >= 2 and fields[-1].lstrip('*') == name:
+                return fields[0].lower()
+    return None
+
+
+def _load_download_state(state_path, mirror):
+    """Ranges of an interrupted download of the same file, or None to start over."""
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if state.get("url") != mirror["url"] or state.get("size") != mirror["size"]:
+        return None
+    return state
+
 
-def download_ffmpeg():
+def _save_download_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _fetch_range(url, path, part, lock):
+    """Downloads the rest of one byte range into its place in the .part file."""
+    start = part["start"] + part["done"]
+    if start > part["end"]:
+        return
+    headers = {'Range': f'bytes={start}-{part["end"]}'}
+    with requests.get(url, headers=headers, stream=True, allow_redirects=True, timeout=30) as response:
+        if response.status_code != 206:
+            raise Exception(f"Server ignored the range request (HTTP {response.status_code})")
+        with open(path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                # Counted only once it left our buffers, so a resume never skips unwritten bytes
+                f.flush()
+                with lock:
+                    part["done"] += len(chunk)
+
+
+def _fetch_whole(url, path, part):
+    """Fallback for servers without range support: one stream from the start."""
+    part["done"] = 0
+    with requests.get(url, stream=True, allow_redirects=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                part["done"] += len(chunk)
+
+
+def download_file(mirror, part_path):
+    """
+    Downloads the mirror's file into `part_path` with parallel ranged requests. The byte
+    ranges are recorded next to it, so an interrupted download continues where it stopped.
+    """
+    part_path = Path(part_path)
+    state_path = Path(f"{part_path}.json")
+    size = mirror["size"]
+    state = _load_download_state(state_path, mirror) if part_path.exists() else None
+    if state is None:
+        part_count = max(1, min(DOWNLOAD_PARTS, size // MIN_PART_SIZE)) if mirror["ranges"] else 1
+        part_size = -(-size // part_count)
+        state = {
+            "url": mirror["url"],
+            "size": size,
+            "parts": [{"start": start, "end": min(start + part_size, size) - 1, "done": 0}
+                      for start in range(0, size, part_size)],
+        }
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+    else:
+        done = sum(part["done"] for part in state["parts"])
+        print(f"Resuming download at {done/1024/1024:.1f} of {size/1024/1024:.1f} MB")
+    _save_download_state(state_path, state)
+
+    print(f"Total download size: {size/1024/1024:.1f} MB in {len(state['parts'])} part(s)")
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=len(state["parts"])) as executor:
+        if mirror["ranges"]:
+            futures = [executor.submit(_fetch_range, mirror["url"], part_path, part, lock) for part in state["parts"]]
+        else:
+            futures = [executor.submit(_fetch_whole, mirror["url"], part_path, state["parts"][0])]
+        try:
+            while not all(future.done() for future in futures):
+                time.sleep(0.5)
+                with lock:
+                    downloaded = sum(part["done"] for part in state["parts"])
+                    if mirror["ranges"]:
+                        _save_download_state(state_path, state)
+                print(f"\rDownload progress: {downloaded / size * 100:.1f}%", end='', flush=True)
+        finally:
+            with lock:
+                _save_download_state(state_path, state)
+            print()
+        for future in futures:
+            future.result()
+    if part_path.stat().st_size != size or sum(part["done"] for part in state["parts"]) != size:
+        raise Exception("Download incomplete")
+    state_path.unlink()
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_executables(zip_path, ffmpeg_dir):
+    """Copies just ffmpeg.exe and ffprobe.exe out of the archive, without unpacking the rest."""
+    ffmpeg_dir = Path(ffmpeg_dir)
+    ffmpeg_dir.mkdir(exist_ok=True)
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = {}
+        for info in zip_ref.infolist():
+            name = info.filename.rsplit('/', 1)[-1]
+            if name in EXECUTABLES and name not in members:
+                members[name] = info
+        if set(members) != set(EXECUTABLES):
+            print("DEBUG: All .exe files found in archive:")
+            for info in zip_ref.infolist():
+                if info.filename.endswith('.exe'):
+                    print(f"  {info.filename}")
+            raise Exception("Could not find ffmpeg.exe and ffprobe.exe in the downloaded archive")
+        for name, info in members.items():
+            target = ffmpeg_dir / name
+            with zip_ref.open(info) as source, open(f"{target}.part", 'wb') as f:
+                shutil.copyfileobj(source, f, CHUNK_SIZE)
+            os.replace(f"{target}.part", target)
+            print(f"Extracted {info.filename}")
+
+
+def download_ffmpeg(ffmpeg_dir=None, urls=None):
     """Download and extract FFmpeg for Windows."""
-    backend_dir = Path(__file__).parent.parent  # Go up from utils/ to backend/
-    ffmpeg_dir = backend_dir / 'ffmpeg'
+    ffmpeg_dir = Path(ffmpeg_dir) if ffmpeg_dir else BACKEND_DIR / 'ffmpeg'
+    part_path = ffmpeg_dir.parent / 'ffmpeg_download.zip.part'
     
     # Check if FFmpeg already exists
     if ffmpeg_dir.exists() and (ffmpeg_dir / 'ffmpeg.exe').exists():
         print("FFmpeg already exists.")
         return
     
-    try:
-        print("Getting latest FFmpeg download URL...")
-        download_url = get_latest_ffmpeg_url()
-        print(f"Downloading FFmpeg from: {download_url}")
-        
-        # Download with progress and redirects allowed
-        response = requests.get(download_url, stream=True, allow_redirects=True, timeout=30)
-        response.raise_for_status()
-        
-        zip_path = backend_dir / 'ffmpeg_download.zip'
-        total_size = int(response.headers.get('content-length', 0))
-        
-        print(f"Total download size: {total_size/1024/1024:.1f} MB")
-        
-        with open(zip_path, 'wb') as f:
-            downloaded = 0
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        percent = (downloaded / total_size) * 100
-                        print(f"\rDownload progress: {percent:.1f}%", end='', flush=True)
-        
-        print("\nExtracting FFmpeg...")
-        
-        # Extract
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(backend_dir / 'ffmpeg_temp')
-        
-        # Find and move executables
-        ffmpeg_dir.mkdir(exist_ok=True)
-        temp_dir = backend_dir / 'ffmpeg_temp'
-        
-        # Look for ffmpeg.exe and ffprobe.exe in extracted folders
-        executables_found = False
-        for root, dirs, files in os.walk(temp_dir):
-            print(f"DEBUG: Checking directory: {root}")
-            print(f"DEBUG: Files found: {files}")
-            
-            # Look for both files
-            ffmpeg_path = None
-            ffprobe_path = None
-            
-            for file in files:
-                if file == 'ffmpeg.exe':
-                    ffmpeg_path = Path(root) / file
-                elif file == 'ffprobe.exe':
-                    ffprobe_path = Path(root) / file
-            
-            # If we found both, copy them
-            if ffmpeg_path and ffprobe_path:
-                shutil.copy2(ffmpeg_path, ffmpeg_dir)
-                shutil.copy2(ffprobe_path, ffmpeg_dir)
-                print(f"Found and copied FFmpeg executables from: {root}")
-                executables_found = True
-                break
-        
-        if not executables_found:
-            # List all .exe files to debug
-            print("DEBUG: All .exe files found in archive:")
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    if file.endswith('.exe'):
-                        print(f"  {root}/{file}")
-            raise Exception("Could not find ffmpeg.exe and ffprobe.exe in the downloaded archive")
-        
-        # Cleanup
-        shutil.rmtree(temp_dir)
-        zip_path.unlink()
-        
-        print("FFmpeg setup complete!")
-        
-        # Verify installation
-        if (ffmpeg_dir / 'ffmpeg.exe').exists() and (ffmpeg_dir / 'ffprobe.exe').exists():
-            print("✓ FFmpeg installation verified")
-        else:
-            raise Exception("FFmpeg installation verification failed")
-            
-    except Exception as e:
-        print(f"Error setting up FFmpeg: {e}")
-        # Cleanup on failure
-        try:
-            if (backend_dir / 'ffmpeg_download.zip').exists():
-                (backend_dir / 'ffmpeg_download.zip').unlink()
-            if (backend_dir / 'ffmpeg_temp').exists():
-                shutil.rmtree(backend_dir / 'ffmpeg_temp')
-        except:
-            pass
-        raise
+    print("Getting latest FFmpeg download URL...")
+    mirror = find_ffmpeg_mirror(urls)
+    print(f"Downloading FFmpeg from: {mirror['url']}")
+    expected_sha256 = get_expected_sha256(mirror['url'])
+
+    # A failed download keeps its .part file; the next attempt resumes it
+    download_file(mirror, part_path)
+
+    if expected_sha256:
+        actual_sha256 = sha256_of(part_path)
+        if actual_sha256 != expected_sha256:
+            part_path.unlink()
+            raise Exception(f"Checksum mismatch: expected {expected_sha256}, got {actual_sha256}")
+        print("✓ Checksum verified")
+    else:
+        print("WARNING: No published checksum found, the download could not be verified")
+
+    print("Extracting FFmpeg...")
+    extract_executables(part_path, ffmpeg_dir)
+    part_path.unlink()
+    
+    print("FFmpeg setup complete!")
+    
+    # Verify installation
+    if all((ffmpeg_dir / name).exists() for name in EXECUTABLES):
+        print("✓ FFmpeg installation verified")
+    else:
+        raise Exception("FFmpeg installation verification failed")
 
 if __name__ == "__main__":
     download_ffmpeg()
\ No newline at end of file
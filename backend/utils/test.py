@@ -1,10 +1,19 @@
 import sys
 import os
+import io
+import time
+import hashlib
 import logging
+import tempfile
+import threading
+import zipfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
 import requests
 
 sys.path.append(os.path.dirname(__file__))
 
+import setup_ffmpeg
 from setup_ffmpeg import get_latest_ffmpeg_url, download_ffmpeg
 
 # Set up logging to see what's happening
@@ -45,7 +54,136 @@ def test_full_download():
         import traceback
         traceback.print_exc()
 
+class FakeMirror(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in for the FFmpeg mirrors, to test the setup offline:
+    /ffmpeg.zip (with HEAD and Range support), /checksums.sha256, a /missing.zip that
+    answers 404, /late/ffmpeg.zip that takes 0.3 s and /slow/ffmpeg.zip that takes 2 s to answer. Set `drop_requests` to cut
+    the next ranged GET requests off halfway, like a flaky connection.
+    """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeMirrorHandler)
+        # Random (incompressible) stand-ins, big enough to be downloaded in several parts
+        self.executables = {name: os.urandom(6 * 1024 * 1024) for name in setup_ffmpeg.EXECUTABLES}
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zip_ref:
+            zip_ref.writestr('ffmpeg-master-latest-win64-gpl/LICENSE.txt', 'GPL')
+            for name, content in self.executables.items():
+                zip_ref.writestr(f'ffmpeg-master-latest-win64-gpl/bin/{name}', content)
+        self.archive = archive.getvalue()
+        self.checksum = hashlib.sha256(self.archive).hexdigest()
+        self.drop_requests = 0
+        self.range_requests = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class FakeMirrorHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        path = self.path.replace('/slow', '').replace('/late', '')
+        if self.path.startswith('/slow'):
+            time.sleep(2)
+        elif self.path.startswith('/late'):
+            time.sleep(0.3)
+        if path == '/ffmpeg.zip':
+            return self.server.archive
+        if path == '/checksums.sha256':
+            return f"{self.server.checksum}  ffmpeg.zip\n".encode()
+        return None
+
+    def do_HEAD(self):
+        body = self._body()
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        body = self._body()
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        start, end = 0, len(body) - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            first, last = range_header.split('=', 1)[1].split('-')
+            start, end = int(first), int(last or end)
+            self.server.range_requests += 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        data = body[start:end + 1]
+        if range_header and self.server.drop_requests > 0:
+            self.server.drop_requests -= 1
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data)
+
+
+def test_offline_download():
+    """Runs the FFmpeg setup against the local stand-in: mirror race, interrupted and resumed download, checksum."""
+    print("=== Testing Download Against Local Mirror ===")
+    mirror = FakeMirror()
+    urls = [mirror.url('/missing.zip'), mirror.url('/slow/ffmpeg.zip'), mirror.url('/ffmpeg.zip')]
+    with tempfile.TemporaryDirectory() as tmp:
+        ffmpeg_dir = Path(tmp) / 'ffmpeg'
+
+        start = time.time()
+        assert get_latest_ffmpeg_url(urls) == mirror.url('/ffmpeg.zip'), "the fastest working mirror should win"
+        print(f"✓ Mirror race won by the fast mirror in {time.time() - start:.2f}s")
+        assert get_latest_ffmpeg_url([mirror.url('/late/ffmpeg.zip'), mirror.url('/ffmpeg.zip')]) == \
+            mirror.url('/late/ffmpeg.zip'), "a preferred mirror answering shortly after should win"
+        print("✓ Preferred mirror chosen over a slightly faster one")
+
+        mirror.drop_requests = 1
+        try:
+            download_ffmpeg(ffmpeg_dir, urls)
+        except Exception as e:
+            print(f"✓ Interrupted download failed as expected: {e}")
+        else:
+            raise AssertionError("the interrupted download should fail")
+        assert (Path(tmp) / 'ffmpeg_download.zip.part').exists(), "the partial download should be kept"
+
+        requests_before = mirror.range_requests
+        download_ffmpeg(ffmpeg_dir, urls)
+        for name, content in mirror.executables.items():
+            assert (ffmpeg_dir / name).read_bytes() == content, f"{name} differs"
+        assert sorted(os.listdir(tmp)) == ['ffmpeg'], "no download leftovers expected"
+        assert sorted(os.listdir(ffmpeg_dir)) == sorted(setup_ffmpeg.EXECUTABLES), "only the executables expected"
+        print(f"✓ Resumed with {mirror.range_requests - requests_before} range request(s), executables intact")
+
+        bad_dir = Path(tmp) / 'bad'
+        mirror.checksum = '0' * 64
+        try:
+            download_ffmpeg(bad_dir, urls)
+        except Exception as e:
+            assert "Checksum mismatch" in str(e), e
+            print("✓ Checksum mismatch detected")
+        else:
+            raise AssertionError("a checksum mismatch should fail")
+    mirror.shutdown()
+
+
 if __name__ == "__main__":
+    if "--offline" in sys.argv:
+        test_offline_download()
+        sys.exit()
+
     test_url_fetching()
     
     response = input("\nDo you want to test the full download? (y/n): ")
@@ -107,18 +107,21 @@ class Livestream {
   final String title;
   final String url;
   final int length;
-  const Livestream({required this.id, required this.title, required this.url, required this.length});
+  final String? thumbnail;
+  const Livestream({required this.id, required this.title, required this.url, required this.length, this.thumbnail});
   factory Livestream.fromJson(Map<String, dynamic> json) => Livestream(
     id: json['id'] ?? '',
     title: json['title'] ?? '',
     url: json['url'] ?? '',
     length: json['length'] ?? 0,
+    thumbnail: json['thumbnail'],
   );
   Map<String, dynamic> toJson() => {
     'id': id,
     'title': title,
     'url': url,
     'length': length,
+    if (thumbnail != null) 'thumbnail': thumbnail,
   };
 }
 
@@ -140,12 +143,14 @@ class ProcessingRequest {
   final String prediger;
   final String titel;
   final DateTime datum;
-  ProcessingRequest({required this.id, required this.prediger, required this.titel, required this.datum});
+  final int? length; // ms, lets the backend compute real progress percentages
+  ProcessingRequest({required this.id, required this.prediger, required this.titel, required this.datum, this.length});
   Map<String, dynamic> toJson() => {
     'id': id,
     'prediger': prediger,
     'titel': titel,
     'datum': "${datum.year.toString().padLeft(4, '0')}-${datum.month.toString().padLeft(2, '0')}-${datum.day.toString().padLeft(2, '0')}",
+    if (length != null) 'length': length,
   };
 }
 
@@ -157,7 +162,10 @@ class UploadProgress {
   UploadProgress({required this.step, required this.progress, required this.message, this.finalPath});
   factory UploadProgress.fromJson(Map<String, dynamic> json) => UploadProgress(
     step: _parseStep(json['step']),
-    progress: double.tryParse(json['progress']) ?? 0.0,
+    // NDJSON streams send the progress as a string, the event stream as a number
+    progress: json['progress'] is num
+        ? (json['progress'] as num).toDouble()
+        : double.tryParse(json['progress'] ?? '') ?? 0.0,
     message: json['message'] ?? '',
     finalPath: json['final_path'],
   );
@@ -43,6 +43,7 @@ class _ProcessingScreenState extends ConsumerState<ProcessingScreen>
           prediger: widget.prediger,
           titel: widget.titel,
           datum: widget.datum,
+          length: widget.livestream.length,
         ),
       );
     });
@@ -1,5 +1,6 @@
 import 'dart:async';
 import 'dart:convert';
+import 'dart:typed_data';
 import 'package:predigt_upload_v2/services/processed_file_service.dart';
 
 import '../models/models.dart';
@@ -26,6 +27,9 @@ class PythonService {
   }
 
   Stream<UploadProgress> processAudio(ProcessingRequest request) async* {
+    String? jobId;
+    int? lastSeq;
+    var finished = false;
     try {
       final requestData = request.toJson();
       print('Sending request data: $requestData');
@@ -48,7 +52,10 @@ class PythonService {
         try {
 
           final data = jsonDecode(line);
+          jobId ??= data['job_id'];
+          lastSeq = data['seq'] ?? lastSeq;
           final progress = UploadProgress.fromJson(data);
+          finished = progress.step == ProcessingStep.complete || progress.step == ProcessingStep.error;
           //print('progress: $progress');
           //print('final_path: ${data['final_path']}');
           // Check if processing is complete and add to processed files
@@ -67,6 +74,12 @@ class PythonService {
       if (e is DioException) {
         print('Dio error response: ${e.response?.data}');
       }
+      if (jobId != null && !finished) {
+        // The job keeps running in the backend: pick its progress up again where the stream broke off
+        print('Progress stream of job $jobId interrupted, reconnecting: $e');
+        yield* followJob(jobId, lastEventId: lastSeq);
+        return;
+      }
       yield UploadProgress(
         step: ProcessingStep.error,
         progress: 0,
@@ -75,6 +88,100 @@ class PythonService {
     }
   }
 
+  /// Follows the progress of a job over the backend's event stream (server-sent events).
+  /// Events after [lastEventId] are replayed first; dropped connections are re-established
+  /// a few times, continuing after the last event received.
+  Stream<UploadProgress> followJob(String jobId, {int? lastEventId, int retries = 5}) async* {
+    var attempt = 0;
+    while (true) {
+      try {
+        final response = await _dio.get(
+          '$baseUrl/events',
+          queryParameters: {'job_id': jobId},
+          options: Options(
+            responseType: ResponseType.stream,
+            headers: {if (lastEventId != null) 'Last-Event-ID': '$lastEventId'},
+          ),
+        );
+        final lines = response.data.stream
+            .cast<List<int>>()
+            .transform(utf8.decoder)
+            .transform(const LineSplitter());
+
+        await for (final line in lines) {
+          // Only the data lines matter; ids are in the event itself, comments are keep-alives
+          if (!line.startsWith('data: ')) continue;
+          final data = jsonDecode(line.substring(6));
+          lastEventId = data['seq'];
+          attempt = 0;
+          final progress = UploadProgress.fromJson(data);
+          if (progress.step == ProcessingStep.complete && data['final_path'] != null) {
+            _processedFilesService.addProcessedFile(data['final_path']);
+          }
+          yield progress;
+          if (progress.step == ProcessingStep.complete || progress.step == ProcessingStep.error) {
+            return;
+          }
+        }
+        // The server closed the stream without a final event, e.g. while shutting down
+        throw Exception('Event stream closed');
+      } catch (e) {
+        attempt++;
+        if (attempt > retries) {
+          yield UploadProgress(
+            step: ProcessingStep.error,
+            progress: 0,
+            message: 'Fehler: Verbindung zum Backend verloren (${e.toString()})',
+          );
+          return;
+        }
+        await Future.delayed(Duration(seconds: attempt));
+      }
+    }
+  }
+
+  /// Processes several livestreams in one batch. Yields (job id, progress) for every job,
+  /// interleaved as the backend reports them.
+  Stream<(String, UploadProgress)> processAudioBatch(List<ProcessingRequest> requests) async* {
+    try {
+      final response = await _dio.post(
+        '$baseUrl/audio/process/batch',
+        data: {'requests': requests.map((r) => r.toJson()).toList()},
+        options: Options(responseType: ResponseType.stream),
+      );
+
+      final stream = response.data.stream
+          .cast<List<int>>()
+          .transform(utf8.decoder)
+          .transform(const LineSplitter());
+
+      await for (final line in stream) {
+        if (line.trim().isEmpty) continue;
+        try {
+          final data = jsonDecode(line);
+          // Batch-level events (queued/finished) carry no job progress
+          if (data['step'] == 'batch') continue;
+          final progress = UploadProgress.fromJson(data);
+          if (progress.step == ProcessingStep.complete && data['final_path'] != null) {
+            _processedFilesService.addProcessedFile(data['final_path']);
+          }
+          yield (data['job_id'] as String, progress);
+        } catch (e) {
+          print('Error parsing JSON line: $e');
+        }
+      }
+    } catch (e) {
+      if (e is DioException) {
+        print('Dio error response: ${e.response?.data}');
+      }
+      yield ('', UploadProgress(
+        step: ProcessingStep.error,
+        progress: 0,
+        message: 'Fehler: ${e.toString()}',
+      ));
+    }
+  }
+
   Future<List<String>> getServerFiles() async {
     try {
       final response = await _dio.get('$baseUrl/server/files');
@@ -116,4 +223,41 @@ class PythonService {
       return false;
     }
   }
+
+  /// Checks many files with one request; returns file name -> exists.
+  Future<Map<String, bool>> checkFilesOnServer(List<String> filePaths) async {
+    try {
+      final response = await _dio.post('$baseUrl/server/check-files', data: {
+        'file_paths': filePaths,
+      });
+      if (response.statusCode == 200 && response.data['status'] == 'success') {
+        return Map<String, bool>.from(response.data['files']);
+      }
+      return {};
+    } catch (e) {
+      print('Error checking files on server: $e');
+      return {};
+    }
+  }
+
+  /// Loads a slice of a processed file's waveform: interleaved min/max values scaled to -1..1.
+  Future<List<double>> getWaveformPeaks(String fileName, int level, {int start = 0, int? count}) async {
+    try {
+      final response = await _dio.get<List<int>>(
+        '$baseUrl/audio/peaks/${Uri.encodeComponent(fileName)}/$level',
+        queryParameters: {'start': start, if (count != null) 'count': count},
+        options: Options(responseType: ResponseType.bytes),
+      );
+      final bytes = Uint8List.fromList(response.data ?? []);
+      final data = ByteData.sublistView(bytes);
+      final bits = int.tryParse(response.headers.value('x-peaks-bits') ?? '') ?? 8;
+      if (bits == 16) {
+        return [for (var i = 0; i + 1 < bytes.length; i += 2) data.getInt16(i, Endian.little) / 32768];
+      }
+      return [for (var i = 0; i < bytes.length; i++) data.getInt8(i) / 128];
+    } catch (e) {
+      print('Error loading waveform: $e');
+      return [];
+    }
+  }
 }
\ No newline at end of file
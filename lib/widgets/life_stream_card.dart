@@ -1,5 +1,6 @@
 import 'package:flutter/material.dart';
 import '../models/models.dart';
+import '../services/python_service.dart';
 
 // widgets/livestream_card.dart
 class LivestreamCard extends StatelessWidget {
@@ -26,6 +27,20 @@ class LivestreamCard extends StatelessWidget {
           child: Column(
             crossAxisAlignment: CrossAxisAlignment.start,
             children: [
+              if (livestream.thumbnail != null) ...[
+                ClipRRect(
+                  borderRadius: BorderRadius.circular(8),
+                  child: AspectRatio(
+                    aspectRatio: 16 / 9,
+                    child: Image.network(
+                      '${PythonService.baseUrl}${livestream.thumbnail}',
+                      fit: BoxFit.cover,
+                      errorBuilder: (context, error, stackTrace) => const SizedBox.shrink(),
+                    ),
+                  ),
+                ),
+                const SizedBox(height: 8),
+              ],
               Text(
                 livestream.title,
                 style: Theme.of(context).textTheme.titleMedium,